@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import queue
+import threading
+
+from replay import ingest_replay
+from replay_cache import load_cache, write_cache
+
+# work kept off the GUI's event loop. A BackgroundTask runs in a daemon thread
+# and hands its results to the GUI through a queue the GUI polls from a timer,
+# so matplotlib is only ever touched on the main thread. Parsing a log and
+# rendering an export would hold the GIL for most of their run and starve
+# playback of it, so the thread hands those to a worker process and only waits
+# on its messages.
+SECTION_ORDER = ("heroes", "buildings", "creeps")
+
+
+class BackgroundTask:
+    def __init__(self, function, *args, **kwargs):
+        # calls function(task, *args, **kwargs) in the background
+        self.progress = 0.0
+        self.status = ""
+        self.result = None
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, args=(function, args, kwargs), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, function, args, kwargs):
+        try:
+            self.result = function(self, *args, **kwargs)
+        except Exception as e:
+            self.error = str(e)
+
+    def report(self, progress, status=None):
+        self.progress = progress
+        if status is not None:
+            self.status = status
+
+    def publish(self, name, value):
+        self._queue.put((name, value))
+
+    def ready(self):
+        # (name, value) pairs published since the last call
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def done(self):
+        return not self._thread.is_alive()
+
+
+def _child_messages(target, *args, daemon=True, **kwargs):
+    # runs target(conn, *args, **kwargs) in a worker process and yields the
+    # (kind, value) messages it sends until it closes the pipe. Spawn rather
+    # than fork: a forked copy of the GUI process would inherit its Tk state.
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(
+        target=target, args=(child_conn, *args), kwargs=kwargs, daemon=daemon
+    )
+    process.start()
+    child_conn.close()
+    try:
+        while True:
+            try:
+                kind, value = conn.recv()
+            except EOFError:
+                break
+            if kind == "error":
+                raise RuntimeError(value)
+            yield kind, value
+    finally:
+        conn.close()
+        process.join()
+    if process.exitcode:
+        raise RuntimeError(f"worker process exited with code {process.exitcode}")
+
+
+def _ingest_worker(conn, log_path):
+    def on_section(name, value):
+        if name in SECTION_ORDER:
+            conn.send(("section", (name, value)))
+
+    try:
+        replay = ingest_replay(
+            log_path, lambda count: conn.send(("read", count)), on_section
+        )
+        conn.send(("status", "Writing cache"))
+        write_cache(log_path, replay)
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def load_replay(task, log_path):
+    # publishes heroes, buildings and creeps, in that order, as soon as each
+    # is available. A fresh cache has them all at once; otherwise the log is
+    # parsed (and cached) by a worker process that sends every section over
+    # as it is built. Returns the cached replay.
+    replay = load_cache(log_path)
+    if replay is not None:
+        for name in SECTION_ORDER:
+            task.publish(name, getattr(replay, name))
+        task.report(1.0, "Loaded from cache")
+        return replay
+
+    size = max(os.path.getsize(log_path), 1)
+    read = 0
+    sections = {}
+    published = []
+    task.report(0.0, "Reading log")
+    for kind, value in _child_messages(_ingest_worker, log_path):
+        if kind == "read":
+            read += value
+            task.report(min(read / size, 1.0))
+        elif kind == "status":
+            task.report(1.0, value)
+        else:
+            name, section = value
+            sections[name] = section
+        # a section that comes early in the log waits for the ones before it
+        while len(published) < len(SECTION_ORDER):
+            name = SECTION_ORDER[len(published)]
+            if name not in sections:
+                break
+            task.publish(name, sections.pop(name))
+            published.append(name)
+
+    replay = load_cache(log_path)
+    if replay is None:
+        raise RuntimeError(f"no cache was written for {log_path}")
+    task.report(1.0, "Loaded")
+    return replay
+
+
+def _export_worker(conn, log_path, output, **options):
+    # export is only imported here, since importing it switches matplotlib
+    # to Agg
+    import export
+
+    try:
+        export.export_replay(
+            log_path,
+            output,
+            on_progress=lambda fraction: conn.send(("progress", fraction)),
+            **options,
+        )
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def export_in_background(task, log_path, output, **options):
+    # not a daemon: the export's own pool of renderers runs under it, and
+    # closing the viewer lets a started export finish
+    task.report(0.0, f"Exporting {output}")
+    for _, fraction in _child_messages(
+        _export_worker, log_path, output, daemon=False, **options
+    ):
+        task.report(fraction)
+    task.report(1.0, f"Exported {output}")
+    return output
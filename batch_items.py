@@ -0,0 +1,162 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrument
+import item_history
+import output_writers
+from ingest import HeroIngest, ItemIngest, ingest_file
+
+# item timelines for many matches at once, one match per worker process
+LOG_SUFFIX = "_combined_log.json"
+OUTPUT_SUFFIX = "_item_output.json"
+
+
+def find_logs(inputs):
+    logs = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*" + LOG_SUFFIX)
+        logs.extend(sorted(glob.glob(pattern)))
+    return list(dict.fromkeys(logs))
+
+
+def match_id(log_path):
+    name = os.path.basename(log_path)
+    return name[: -len(LOG_SUFFIX)] if name.endswith(LOG_SUFFIX) else name
+
+
+@instrument.traced("process_match")
+def process_match(log_path, output_dir=None, use_cache=True, suffix=OUTPUT_SUFFIX):
+    # returns (match_id, output_data); output_data is None when it was
+    # written to output_dir, to keep it out of the pickled result
+    if use_cache:
+        data = item_history.load_data(log_path)
+        if data is None:
+            raise RuntimeError(f"Failed to load {log_path}")
+        heroes_data = item_history.heroes_items(data)
+    else:
+        # both sections from one pass over the log
+        hero_ingest = HeroIngest()
+        _, items = ingest_file(log_path, [hero_ingest, ItemIngest()])
+        heroes_data = item_history.get_player_id(
+            (-1, hero_name, hero_data)
+            for hero_name, hero_data in hero_ingest.info.items()
+        )
+        item_history.assign_items(items, heroes_data)
+
+    if output_dir is None:
+        return match_id(log_path), item_history.heroes_output(
+            heroes_data, verbose=False
+        )
+
+    output_file = os.path.join(output_dir, match_id(log_path) + suffix)
+    item_history.write_heroes_output(
+        item_history.iter_heroes_output(heroes_data, verbose=False), output_file
+    )
+    return match_id(log_path), None
+
+
+def _merged_line(match, output_data):
+    return {"match": match, "heroes": output_data}
+
+
+def _merged_rows(match, output_data):
+    for player_id, entry in output_data.items():
+        for row in item_history.history_rows(player_id, entry):
+            yield (match, *row)
+
+
+def run_batch(
+    logs,
+    output_dir=None,
+    merged_file=None,
+    workers=None,
+    use_cache=True,
+    suffix=OUTPUT_SUFFIX,
+):
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    merged = None
+    if merged_file:
+        merged = output_writers.open_writer(
+            merged_file,
+            line=_merged_line,
+            columns=[("match", "str")] + item_history.HISTORY_COLUMNS,
+            rows=_merged_rows,
+        )
+    failed = []
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    process_match,
+                    log_path,
+                    None if merged else output_dir,
+                    use_cache,
+                    suffix,
+                ): log_path
+                for log_path in logs
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                log_path = futures[future]
+                try:
+                    match, output_data = future.result()
+                except Exception as e:
+                    failed.append(log_path)
+                    print(f"[{done}/{len(logs)}] {log_path} failed: {str(e)}")
+                    continue
+
+                if merged:
+                    # written as soon as the match is ready
+                    merged.write(match, output_data)
+                print(f"[{done}/{len(logs)}] {match}")
+    finally:
+        if merged:
+            merged.close()
+
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Item timelines for many matches")
+    parser.add_argument(
+        "inputs", nargs="+", help="directories or globs of *_combined_log.json files"
+    )
+    parser.add_argument("--output-dir", default=".", help="per-match output files")
+    parser.add_argument(
+        "--merged", default=None, help="one merged output file (.json/.ndjson/.npz)"
+    )
+    parser.add_argument(
+        "--suffix",
+        default=OUTPUT_SUFFIX,
+        help="per-match file suffix, e.g. _item_output.ndjson.gz or .npz",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="stream the logs instead of building the binary cache",
+    )
+    args = parser.parse_args()
+
+    logs = find_logs(args.inputs)
+    if not logs:
+        print("No combined logs found.")
+        return
+
+    failed = run_batch(
+        logs,
+        output_dir=args.output_dir,
+        merged_file=args.merged,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        suffix=args.suffix,
+    )
+    print(f"Processed {len(logs) - len(failed)} of {len(logs)} matches")
+
+
+if __name__ == "__main__":
+    main()
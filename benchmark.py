@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+import item_history
+import itemization
+import timestamp_fix
+import vis
+from blit_manager import BlitManager
+from replay_cache import cache_dir, open_replay
+from replay_stream import iter_records
+from synthetic_log import SyntheticMatch
+
+# times every processing stage on one (synthetic) combined log and writes the
+# results as JSON; --compare flags stages that got slower or hungrier than a
+# previous run. Each stage is timed `repeat` times without tracing, then run
+# once more under tracemalloc for its peak Python/NumPy allocation.
+
+
+def _quiet(function):
+    def run(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args)
+
+    return run
+
+
+def _stages(log_path, work_dir, frames):
+    # name -> (setup, run); setup's return value is passed to run, so state a
+    # stage consumes (heroes_data, combat_log, the cache) is fresh every time
+    def no_setup():
+        return ()
+
+    def drop_cache():
+        shutil.rmtree(cache_dir(log_path), ignore_errors=True)
+        return ()
+
+    def heroes_data():
+        replay = open_replay(log_path)
+        return replay.items, item_history.get_player_id(replay.hero_info_records())
+
+    def item_history_data():
+        return (
+            item_history.heroes_items(open_replay(log_path)).values(),
+            os.path.join(work_dir, "itemization.txt"),
+            os.path.join(work_dir, "itemization.json"),
+        )
+
+    def combat_log():
+        replay = open_replay(log_path)
+        return (
+            log_path,
+            replay.combat_log,
+            replay.events.combatlog_end(),
+            replay.events.buildings_end(),
+            os.path.join(work_dir, "updated_log.json"),
+        )
+
+    figure = {}
+
+    def plot():
+        if not figure:
+            replay = open_replay(log_path)
+            fig, _, lines, tick_text, building_layer, creep_layer = vis.setup_plot(
+                replay.heroes, replay.buildings, replay.creeps, None
+            )
+            blit_manager = BlitManager(
+                fig.canvas,
+                building_layer.artists()
+                + list(lines.values())
+                + [tick_text, *creep_layer.artists()],
+            )
+            fig.canvas.draw()
+            tick_min, tick_max = replay.heroes.tick_range()
+            figure.update(
+                fig=fig,
+                args=(
+                    lines,
+                    replay.heroes,
+                    tick_text,
+                    creep_layer,
+                    replay.creeps,
+                    building_layer,
+                ),
+                blit_manager=blit_manager,
+                ticks=np.linspace(tick_min, tick_max, frames).tolist(),
+            )
+        return (figure,)
+
+    def animate(state):
+        for tick in state["ticks"]:
+            vis.animate(tick, *state["args"])
+            state["blit_manager"].update()
+
+    stages = {
+        "load_data_stream": (
+            no_setup,
+            lambda: vis.load_data(log_path, use_cache=False),
+        ),
+        "load_data_cache_build": (drop_cache, lambda: vis.load_data(log_path)),
+        "load_data_cache": (no_setup, lambda: vis.load_data(log_path)),
+        "process_hero_data": (
+            no_setup,
+            lambda: vis.process_hero_data(iter_records(log_path, "heroes")),
+        ),
+        "process_creep_data": (
+            no_setup,
+            lambda: vis.process_creep_data(iter_records(log_path, "creeps")),
+        ),
+        "assign_items": (heroes_data, item_history.assign_items),
+        "list_player_items": (
+            item_history_data,
+            _quiet(itemization.list_player_items),
+        ),
+        "offset_combatlog": (combat_log, _quiet(timestamp_fix.offset_combatlog)),
+        "animate": (plot, animate),
+    }
+    return stages, figure
+
+
+def measure(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "peak_bytes": peak,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(log_path, repeat=3, frames=60, only=None, log_params=None):
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages, figure = _stages(log_path, work_dir, frames)
+        results = {}
+        try:
+            for name, (setup, run) in stages.items():
+                if only and name not in only:
+                    continue
+                results[name] = measure(setup, run, repeat)
+                if name == "animate":
+                    results[name]["seconds_per_frame"] = (
+                        results[name]["seconds"] / frames
+                    )
+                print(
+                    f"{name:24} {results[name]['seconds'] * 1000:10.1f} ms"
+                    f" {results[name]['peak_bytes'] / 2**20:10.1f} MiB"
+                )
+        finally:
+            if figure:
+                plt.close(figure["fig"])
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "log": {
+            "path": os.path.basename(log_path),
+            "bytes": os.path.getsize(log_path),
+            **(log_params or {}),
+        },
+        "repeat": repeat,
+        "frames": frames,
+        "stages": results,
+        # ru_maxrss is in KiB on Linux
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # stages more than `tolerance` slower (or with a larger peak) than baseline
+    regressions = []
+    for name, stage in results["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            ratio = stage[metric] / before[metric] if before[metric] else 1.0
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressions.append((name, metric, ratio))
+            print(f"{name:24} {metric:12} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the processing stages")
+    parser.add_argument("--log", default=None, help="existing combined log to time")
+    parser.add_argument("--samples", type=int, default=3600)
+    parser.add_argument("--creeps", type=int, default=120)
+    parser.add_argument("--item-churn", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--stage", action="append", help="only run these stages")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", default=None, help="baseline results file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        if args.log:
+            log_path, log_params = args.log, None
+        else:
+            log_path = os.path.join(log_dir, "synthetic_combined_log.json")
+            log_params = {
+                "samples": args.samples,
+                "creeps": args.creeps,
+                "item_churn": args.item_churn,
+                "seed": args.seed,
+            }
+            SyntheticMatch(
+                args.samples, args.creeps, args.item_churn, seed=args.seed
+            ).write(log_path)
+        results = run_benchmarks(
+            log_path, args.repeat, args.frames, args.stage, log_params
+        )
+        if not args.log:
+            shutil.rmtree(cache_dir(log_path), ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
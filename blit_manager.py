@@ -0,0 +1,65 @@
+import time
+from collections import deque
+
+# redraws only the animated artists on top of a cached copy of the static
+# figure (background map, buildings, axes, widgets)
+
+
+class BlitManager:
+    def __init__(self, canvas, animated_artists=(), window=30):
+        self.canvas = canvas
+        self._background = None
+        self._artists = []
+        self._frame_times = deque(maxlen=window)
+        self._render_times = deque(maxlen=window)
+
+        for artist in animated_artists:
+            self.add_artist(artist)
+        # a full redraw (resize, widget click, plt.draw) refreshes the cache
+        self.cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def add_artist(self, artist, index=None):
+        # artists are drawn in order; index places one below those after it
+        if artist.figure != self.canvas.figure:
+            raise RuntimeError("Artist does not belong to this figure")
+        artist.set_animated(True)
+        if index is None:
+            self._artists.append(artist)
+        else:
+            self._artists.insert(index, artist)
+
+    def on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        figure = self.canvas.figure
+        for artist in self._artists:
+            figure.draw_artist(artist)
+
+    def update(self):
+        start = time.perf_counter()
+        if self._background is None:
+            self.on_draw(None)
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
+
+        end = time.perf_counter()
+        self._frame_times.append(end)
+        self._render_times.append(end - start)
+
+    def fps(self):
+        # frames actually shown per wall-clock second
+        if len(self._frame_times) < 2:
+            return 0.0
+        return (len(self._frame_times) - 1) / (
+            self._frame_times[-1] - self._frame_times[0]
+        )
+
+    def render_fps(self):
+        # frames per second the renderer could sustain
+        total = sum(self._render_times)
+        return len(self._render_times) / total if total else 0.0
@@ -0,0 +1,238 @@
+import functools
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# minute-bucketed item build orders as integer arrays. Hero and item names
+# are interned once; rows only carry ids, and names are looked up when the
+# text/JSON output is rendered at the end.
+BUILD_DTYPE = np.dtype(
+    [("hero", np.int32), ("minute", np.int32), ("item", np.int32)]
+)
+TICKS_PER_MINUTE = 60  # the bucket itemization has always used
+UNKNOWN_ITEM = "INCORRECT INFO - CHECK"
+HERO_PREFIX = "CDOTA_Unit_Hero_"
+_ITEM_NAME_NOISE = re.compile(r"CDOTA_Item_|(\(\d+\).*)")
+# packed (hero, minute, item) keys for PopularBuilds
+_ITEM_BITS = 21
+_MINUTE_BITS = 21
+_MINUTE_BIAS = 1 << (_MINUTE_BITS - 1)
+
+
+@functools.lru_cache(maxsize=None)
+def clean_item_name(item_name):
+    # the same few hundred item names repeat in every match
+    return _ITEM_NAME_NOISE.sub("", item_name)
+
+
+def clean_hero_name(hero_name):
+    return hero_name.replace(HERO_PREFIX, "")
+
+
+class NameTable:
+    def __init__(self, names=()):
+        self.names = []
+        self._index = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        position = self._index.get(name)
+        if position is None:
+            position = self._index[name] = len(self.names)
+            self.names.append(name)
+        return position
+
+    def intern_all(self, names):
+        return np.array([self.intern(name) for name in names], dtype=np.int32)
+
+
+class BuildOrders:
+    def __init__(self, heroes, items, rows):
+        # rows are sorted by (hero, minute, item name); heroes keep the order
+        # they were first seen in
+        self.heroes = list(heroes)
+        self.items = list(items)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def groups(self):
+        # (hero_name, [(minute, [item_name, ...]), ...]) per hero
+        rows = self.rows
+        if not len(rows):
+            return
+        hero, minute = rows["hero"], rows["minute"]
+        breaks = np.flatnonzero((hero[1:] != hero[:-1]) | (minute[1:] != minute[:-1]))
+        starts = np.concatenate(([0], breaks + 1)).tolist()
+        ends = starts[1:] + [len(rows)]
+        items = [self.items[item] for item in rows["item"].tolist()]
+        heroes, minutes = hero.tolist(), minute.tolist()
+
+        current_hero, hero_groups = None, None
+        for start, end in zip(starts, ends):
+            if heroes[start] != current_hero:
+                if hero_groups is not None:
+                    yield self.heroes[current_hero], hero_groups
+                current_hero, hero_groups = heroes[start], []
+            hero_groups.append((minutes[start], items[start:end]))
+        yield self.heroes[current_hero], hero_groups
+
+    def iter_json(self):
+        # one {"hero", "items": [{"minute", "items"}]} record per hero
+        for hero, minutes in self.groups():
+            yield {
+                "hero": hero,
+                "items": [
+                    {"minute": minute, "items": item_names}
+                    for minute, item_names in minutes
+                ],
+            }
+
+    def iter_text(self):
+        for hero, minutes in self.groups():
+            yield f"\n {hero}: "
+            yield " ".join(
+                f"\n min {minute} > {', '.join(item_names)}"
+                for minute, item_names in minutes
+            )
+            yield "\n"
+
+
+class BuildOrdersBuilder:
+    def __init__(self):
+        self.heroes = NameTable()
+        self.items = NameTable()
+        self._hero = array("i")
+        self._minute = array("i")
+        self._item = array("i")
+
+    def add(self, hero_name, tick, item_name):
+        # one purchase, with names as they appear in the log
+        self._hero.append(self.heroes.intern(clean_hero_name(hero_name)))
+        self._minute.append(int(tick) // TICKS_PER_MINUTE)
+        self._item.append(self.items.intern(clean_item_name(item_name)))
+
+    def add_purchases(self, hero_name, ticks, item_ids):
+        # many purchases of one hero; item_ids index self.items
+        if not len(ticks):
+            return
+        hero = self.heroes.intern(clean_hero_name(hero_name))
+        self._hero.extend([hero] * len(ticks))
+        self._minute.extend((np.asarray(ticks) // TICKS_PER_MINUTE).tolist())
+        self._item.extend(np.asarray(item_ids).tolist())
+
+    def build(self):
+        rows = np.empty(len(self._hero), dtype=BUILD_DTYPE)
+        rows["hero"] = np.frombuffer(self._hero, dtype=np.int32)
+        rows["minute"] = np.frombuffer(self._minute, dtype=np.int32)
+        rows["item"] = np.frombuffer(self._item, dtype=np.int32)
+        # items within a minute are listed alphabetically
+        rank = np.empty(len(self.items), dtype=np.int32)
+        rank[np.argsort(np.array(self.items.names, dtype=object))] = np.arange(
+            len(self.items)
+        )
+        order = np.lexsort((rank[rows["item"]], rows["minute"], rows["hero"]))
+        return BuildOrders(self.heroes.names, self.items.names, rows[order])
+
+
+def from_item_store(items, heroes_data):
+    # purchases straight from an ItemStore; heroes_data maps player id to
+    # {"hero_name", ...} as item_history.get_player_id builds it
+    builder = BuildOrdersBuilder()
+    # cleaned id of every interned raw name, plus UNKNOWN_ITEM at the end so
+    # the "no name" index -1 lands on it
+    clean_ids = builder.items.intern_all(
+        [clean_item_name(name) for name in items.names] + [UNKNOWN_ITEM]
+    )
+    for player_id, hero in heroes_data.items():
+        events = items.owner_events(player_id)
+        if not len(events):
+            continue
+        # an item keeps the name of its first event, like item_history does
+        item = events["item"]
+        starts = np.flatnonzero(np.concatenate(([True], item[1:] != item[:-1])))
+        names = np.repeat(
+            events["name"][starts], np.diff(np.append(starts, len(events)))
+        )
+        purchased = ~events["deleted"]
+        builder.add_purchases(
+            hero["hero_name"], events["tick"][purchased], clean_ids[names[purchased]]
+        )
+    return builder.build()
+
+
+def _pack(heroes, minutes, items):
+    return (
+        (heroes.astype(np.int64) << (_MINUTE_BITS + _ITEM_BITS))
+        | ((minutes.astype(np.int64) + _MINUTE_BIAS) << _ITEM_BITS)
+        | items.astype(np.int64)
+    )
+
+
+def _unpack(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return (
+        keys >> (_MINUTE_BITS + _ITEM_BITS),
+        ((keys >> _ITEM_BITS) & ((1 << _MINUTE_BITS) - 1)) - _MINUTE_BIAS,
+        keys & ((1 << _ITEM_BITS) - 1),
+    )
+
+
+class PopularBuilds:
+    # how many matches had each hero buy each item in each minute
+    def __init__(self):
+        self.heroes = NameTable()
+        self.items = NameTable()
+        self.counts = Counter()  # packed (hero, minute, item) -> matches
+        self.hero_matches = Counter()  # hero id -> matches
+        self.matches = 0
+
+    def add(self, builds):
+        hero_ids = self.heroes.intern_all(builds.heroes)
+        item_ids = self.items.intern_all(builds.items)
+        rows = builds.rows
+        keys = _pack(
+            hero_ids[rows["hero"]], rows["minute"], item_ids[rows["item"]]
+        )
+        self.counts.update(np.unique(keys).tolist())
+        self.hero_matches.update(np.unique(hero_ids[rows["hero"]]).tolist())
+        self.matches += 1
+
+    def popular(self, top=3):
+        # {hero: [{"minute", "matches", "items": [{"item", "matches"}]}]} with
+        # the `top` most common purchases of every minute
+        if not self.counts:
+            return {}
+        keys = np.fromiter(self.counts, dtype=np.int64, count=len(self.counts))
+        counts = np.fromiter(
+            self.counts.values(), dtype=np.int64, count=len(self.counts)
+        )
+        heroes, minutes, items = _unpack(keys)
+        order = np.lexsort((items, -counts, minutes, heroes))
+
+        result = {}
+        previous, taken = None, 0
+        for hero, minute, item, count in zip(
+            heroes[order].tolist(),
+            minutes[order].tolist(),
+            items[order].tolist(),
+            counts[order].tolist(),
+        ):
+            if (hero, minute) != previous:
+                previous, taken = (hero, minute), 0
+                result.setdefault(self.heroes.names[hero], []).append(
+                    {"minute": minute, "matches": self.hero_matches[hero], "items": []}
+                )
+            if taken < top:
+                result[self.heroes.names[hero]][-1]["items"].append(
+                    {"item": self.items.names[item], "matches": count}
+                )
+                taken += 1
+        return result
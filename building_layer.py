@@ -0,0 +1,43 @@
+import numpy as np
+
+from creep_layer import team_rgba
+
+# one marker per building, O(buildings) to draw. The scatter only changes
+# when playback crosses a tick where a building appears or is destroyed, so
+# most frames leave it untouched.
+
+
+class BuildingLayer:
+    def __init__(self, ax, buildings, colors, default="orange"):
+        self.table = team_rgba(colors, default)
+        self.scatter = ax.scatter(
+            [], [], marker="^", s=140, color="gray", label="Buildings"
+        )
+        self.set_buildings(buildings)
+
+    def set_buildings(self, buildings):
+        # e.g. once a log loading in the background gets to its buildings
+        self.buildings = buildings
+        self.positions = buildings.positions()
+        self.rgba = self.table[buildings.data["team"].astype(np.uint8)]
+        self._changes = buildings.change_ticks()
+        self._period = None  # index of the change interval last shown
+        self.scatter.set_offsets(self.positions)
+        if len(buildings):
+            self.scatter.set_facecolors(self.rgba)
+            self.scatter.set_edgecolors(self.rgba)
+
+    def artists(self):
+        return [self.scatter]
+
+    def update(self, tick):
+        # returns whether the set of standing buildings changed
+        period = int(np.searchsorted(self._changes, tick, side="right"))
+        if period == self._period:
+            return False
+        self._period = period
+        alive = self.buildings.alive_at(tick)
+        self.scatter.set_offsets(self.positions[alive])
+        self.scatter.set_facecolors(self.rgba[alive])
+        self.scatter.set_edgecolors(self.rgba[alive])
+        return True
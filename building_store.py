@@ -0,0 +1,67 @@
+import numpy as np
+
+from track_store import NO_TICK
+
+# one row per building: where it stands and the ticks it is alive for. The
+# raw "buildings" section repeats every building on every tick; only its
+# first position and its "deleted" tick matter.
+BUILDING_DTYPE = np.dtype(
+    [
+        ("x", np.float32),
+        ("y", np.float32),
+        ("team", np.int8),
+        ("born", np.int32),  # first tick the building shows up
+        ("died", np.int32),  # tick it is deleted, NO_TICK if it survives
+    ]
+)
+
+
+class BuildingStore:
+    def __init__(self, ids, data, types=None):
+        # data[i] belongs to ids[i]; types are the buildingType names
+        self.ids = list(ids)
+        self.data = data
+        self.types = list(types) if types is not None else [None] * len(self.ids)
+
+    def __len__(self):
+        return len(self.data)
+
+    def positions(self):
+        return np.column_stack((self.data["x"], self.data["y"]))
+
+    def alive_at(self, tick):
+        return (self.data["born"] <= tick) & (tick < self.data["died"])
+
+    def change_ticks(self):
+        # sorted ticks at which some building appears or is destroyed; the
+        # alive set is constant between two of them
+        ticks = np.concatenate((self.data["born"], self.data["died"]))
+        return np.unique(ticks[ticks != NO_TICK])
+
+    def bounds(self):
+        if not len(self.data):
+            return None
+        x, y = self.data["x"], self.data["y"]
+        return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+
+class BuildingBuilder:
+    def __init__(self):
+        self._rows = {}  # building id -> [x, y, team, born, died, type]
+
+    def add(self, tick, building_id, x, y, team=0, kind=None):
+        # buildings do not move; the first sighting is all that is kept
+        if building_id not in self._rows:
+            self._rows[building_id] = [x, y, team, tick, NO_TICK, kind]
+
+    def mark_death(self, tick, building_id):
+        row = self._rows.get(building_id)
+        if row is not None and row[4] == NO_TICK:
+            row[4] = tick
+
+    def build(self):
+        data = np.empty(len(self._rows), dtype=BUILDING_DTYPE)
+        rows = list(self._rows.values())
+        for i, field in enumerate(BUILDING_DTYPE.names):
+            data[field] = [row[i] for row in rows]
+        return BuildingStore(self._rows, data, [row[5] for row in rows])
@@ -0,0 +1,59 @@
+from array import array
+from itertools import groupby
+
+import numpy as np
+
+# columnar combat log: one row per (tick, event type) entry of "combatLog"
+
+
+class CombatLog:
+    def __init__(self, ticks, types, type_names, events, offset=0):
+        # ticks are the raw log ticks; offset is the alignment shift, applied
+        # on read so realigning never touches the rows themselves
+        self.ticks = ticks
+        self.types = types
+        self.type_names = list(type_names)
+        self.events = events
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def aligned_ticks(self):
+        return self.ticks + self.offset
+
+    def tick_items(self):
+        # (tick_str, {event_type: events}) per aligned tick, in log order
+        tick_strings = self.aligned_ticks().astype(str).tolist()
+        rows = zip(tick_strings, self.types.tolist(), self.events)
+        for tick_str, group in groupby(rows, key=lambda row: row[0]):
+            yield tick_str, {
+                self.type_names[type_index]: events for _, type_index, events in group
+            }
+
+
+class CombatLogBuilder:
+    def __init__(self):
+        self.type_names = []
+        self._type_index = {}
+        self._tick = array("i")
+        self._type = array("h")
+        self._events = []
+
+    def add(self, tick, event_type, events):
+        type_index = self._type_index.get(event_type)
+        if type_index is None:
+            type_index = self._type_index[event_type] = len(self.type_names)
+            self.type_names.append(event_type)
+        self._tick.append(tick)
+        self._type.append(type_index)
+        self._events.append(events)
+
+    def build(self, offset=0):
+        return CombatLog(
+            np.frombuffer(self._tick, dtype=np.int32).astype(np.int64),
+            np.frombuffer(self._type, dtype=np.int16).copy(),
+            self.type_names,
+            self._events,
+            offset,
+        )
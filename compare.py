@@ -0,0 +1,359 @@
+import argparse
+import math
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.widgets import Button, Slider
+
+import vis
+from batch_items import match_id
+from blit_manager import BlitManager
+from building_store import BuildingStore
+from playback import PlaybackClock
+from replay_cache import open_replay
+from timestamp_fix import combatlog_offset
+from track_store import TRACK_DTYPE
+from track_window import WindowedTracks
+
+# several matches side by side on one clock. Every match is loaded and played
+# in its own worker process; per frame, the main process sends the requested
+# tick over the worker's pipe and reads the hero and creep rows back from its
+# shared-memory block, so only ticks and short replies go through the pipe.
+# Nothing the main process waits on can be held by a worker, so one that
+# dies mid-frame is noticed instead of hanging the viewer.
+# Matches are aligned by game time: entity ticks minus the offset timestamp_fix
+# finds between the entities and the combat log.
+_HEADER_BYTES = 16  # int64 hero rows, int64 creep rows
+WORKER_POLL_SECONDS = 0.5  # how often a frame wait checks the worker is alive
+
+
+class SharedFrame:
+    def __init__(self, capacity, name=None):
+        # name=None creates the block, otherwise an existing one is attached
+        size = _HEADER_BYTES + max(capacity, 1) * TRACK_DTYPE.itemsize
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name, track=False)
+        self.capacity = capacity
+        buffer = self.shm.buf
+        self.counts = np.ndarray(2, dtype=np.int64, buffer=buffer)
+        self.rows = np.ndarray(
+            max(capacity, 1), dtype=TRACK_DTYPE, buffer=buffer, offset=_HEADER_BYTES
+        )
+
+    def write(self, heroes, creeps):
+        self.counts[:] = len(heroes), len(creeps)
+        self.rows[: len(heroes)] = heroes
+        self.rows[len(heroes) : len(heroes) + len(creeps)] = creeps
+
+    def read(self):
+        heroes, creeps = self.counts.tolist()
+        return self.rows[:heroes], self.rows[heroes : heroes + creeps]
+
+    def close(self):
+        # views into the buffer must go before it can be closed
+        self.counts = self.rows = None
+        self.shm.close()
+
+
+def match_offset(replay):
+    offset = combatlog_offset(
+        replay.events.combatlog_end(), replay.events.buildings_end()
+    )
+    return offset or 0
+
+
+def _match_worker(log_path, conn):
+    try:
+        replay = open_replay(log_path)
+        heroes = WindowedTracks(replay.heroes)
+        creeps = WindowedTracks(replay.creeps)
+        offset = match_offset(replay)
+        frame = SharedFrame(len(heroes) + len(creeps))
+    except Exception as e:
+        conn.send({"error": str(e)})
+        return
+
+    buildings = replay.buildings
+    conn.send(
+        {
+            "frame": frame.shm.name,
+            "capacity": frame.capacity,
+            "offset": offset,
+            "names": heroes.names,
+            "teams": heroes.teams(),
+            "tick_range": heroes.tick_range() or (0, 0),
+            "sample_interval": heroes.sample_interval(),
+            "bounds": [heroes.bounds(), creeps.bounds(), buildings.bounds()],
+            "buildings": (buildings.ids, np.array(buildings.data), buildings.types),
+        }
+    )
+    try:
+        while True:
+            try:
+                tick = conn.recv()
+            except EOFError:
+                break  # the main process is gone
+            if tick is None:
+                break
+            try:
+                frame.write(
+                    heroes.positions_at(tick + offset, interpolate=True),
+                    creeps.positions_at(tick + offset, interpolate=True),
+                )
+            except Exception as e:
+                # reported instead of done; the main process stops asking
+                conn.send({"error": str(e)})
+                break
+            conn.send({"done": tick})
+    finally:
+        heroes.close()
+        creeps.close()
+        frame.close()
+        frame.shm.unlink()
+
+
+class MatchWorker:
+    # the main process's end of one _match_worker
+    def __init__(self, context, log_path):
+        self.log_path = log_path
+        self.match = match_id(log_path)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_match_worker, args=(log_path, child_conn), daemon=True
+        )
+        self.process.start()
+        # only the worker holds the other end, so its pipe closes when it dies
+        child_conn.close()
+        self.frame = None
+        self.info = None
+        self.failed = False
+
+    def ready(self):
+        # blocks until the match is loaded; False if it failed
+        try:
+            self.info = self.conn.recv()
+        except EOFError:
+            self.process.join()
+            self.info = {"error": self._exit_message()}
+        if "error" in self.info:
+            print(f"{self.log_path} failed: {self.info['error']}")
+            self.process.join()
+            return False
+        self.offset = self.info["offset"]
+        self.frame = SharedFrame(self.info["capacity"], self.info["frame"])
+        return True
+
+    def game_range(self):
+        tick_min, tick_max = self.info["tick_range"]
+        return tick_min - self.offset, tick_max - self.offset
+
+    def submit(self, game_tick):
+        if self.failed:
+            return
+        try:
+            self.conn.send(game_tick)
+        except OSError:
+            self._fail(self._exit_message())
+
+    def result(self):
+        # (heroes, creeps) rows of the submitted tick; None once the worker
+        # has failed or died, which is reported the first time
+        if self.failed:
+            return None
+        while not self.conn.poll(WORKER_POLL_SECONDS):
+            if not self.process.is_alive():
+                self._fail(self._exit_message())
+                return None
+        try:
+            reply = self.conn.recv()
+        except EOFError:
+            self._fail(self._exit_message())
+            return None
+        if "error" in reply:
+            self._fail(reply["error"])
+            return None
+        return self.frame.read()
+
+    def _exit_message(self):
+        self.process.join(timeout=WORKER_POLL_SECONDS)
+        return f"worker exited with code {self.process.exitcode}"
+
+    def _fail(self, message):
+        self.failed = True
+        print(f"{self.log_path} failed: {message}")
+
+    def close(self):
+        if self.frame is not None:
+            if not self.failed:
+                try:
+                    self.conn.send(None)
+                except OSError:
+                    pass  # already gone
+            self.frame.close()
+            self.frame = None
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+def start_workers(log_paths):
+    # every match loads (and builds its cache) at the same time
+    context = multiprocessing.get_context()
+    workers = [MatchWorker(context, log_path) for log_path in log_paths]
+    return [worker for worker in workers if worker.ready()]
+
+
+def setup_figure(workers, hero=None, background_image_path="Game_map_7.33.webp"):
+    columns = math.ceil(math.sqrt(len(workers)))
+    rows = math.ceil(len(workers) / columns)
+    fig, axes = plt.subplots(
+        rows,
+        columns,
+        figsize=(6 * columns, 6 * rows),
+        sharex=True,
+        sharey=True,
+        squeeze=False,
+    )
+    plt.subplots_adjust(bottom=0.12)
+    limits = vis.data_limits(
+        [bounds for worker in workers for bounds in worker.info["bounds"]]
+    )
+
+    views = []
+    for ax, worker in zip(axes.flat, workers):
+        info = worker.info
+        lines, tick_text, building_layer, creep_layer = vis.setup_axes(
+            ax,
+            info["names"],
+            info["teams"],
+            BuildingStore(*info["buildings"]),
+            limits,
+            background_image_path,
+        )
+        if hero is not None:
+            # only the compared hero
+            for name in [name for name in lines if hero not in name]:
+                lines.pop(name).remove()
+        ax.set_title(worker.match)
+        views.append((lines, tick_text, building_layer, creep_layer))
+    for ax in axes.flat[len(workers) :]:
+        ax.set_visible(False)
+    return fig, views
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare matches side by side")
+    parser.add_argument("logs", nargs="+", help="*_combined_log.json files")
+    parser.add_argument("--hero", default=None, help="only show heroes matching this")
+    parser.add_argument("--background", default="Game_map_7.33.webp")
+    args = parser.parse_args()
+
+    matplotlib.use("TkAgg")
+    workers = start_workers(args.logs)
+    if not workers:
+        print("No match could be loaded.")
+        return
+
+    try:
+        fig, views = setup_figure(workers, args.hero, args.background)
+        clock_text = fig.text(0.02, 0.97, "", fontsize=12, fontweight="bold")
+        blit_manager = BlitManager(
+            fig.canvas,
+            [
+                artist
+                for lines, tick_text, building_layer, creep_layer in views
+                for artist in (
+                    *building_layer.artists(),
+                    *lines.values(),
+                    tick_text,
+                    *creep_layer.artists(),
+                )
+            ]
+            + [clock_text],
+        )
+
+        ranges = [worker.game_range() for worker in workers]
+        tick_min = min(start for start, _ in ranges)
+        tick_max = max(end for _, end in ranges)
+        sample_interval = min(worker.info["sample_interval"] for worker in workers)
+        clock = PlaybackClock(
+            tick_min, tick_max, sample_interval * vis.SAMPLES_PER_SECOND
+        )
+
+        def draw_frame(game_tick):
+            # all workers compute their frame in parallel, then it is drawn
+            for worker in workers:
+                worker.submit(game_tick)
+            for worker, (lines, tick_text, building_layer, creep_layer) in zip(
+                workers, views
+            ):
+                rows = worker.result()
+                if rows is None:
+                    continue  # the match stays at its last frame
+                heroes, creeps = rows
+                vis.draw_positions(
+                    game_tick + worker.offset,
+                    lines,
+                    worker.info["names"],
+                    heroes,
+                    tick_text,
+                    creep_layer,
+                    creeps,
+                    building_layer,
+                )
+            clock_text.set_text(f"Game tick: {int(game_tick)}")
+            blit_manager.update()
+
+        timer = fig.canvas.new_timer(interval=vis.FRAME_INTERVAL_MS)
+        timer.add_callback(lambda: draw_frame(clock.advance()))
+        timer.start()
+        is_playing = True
+
+        def toggle_play(_):
+            nonlocal is_playing
+            if is_playing:
+                timer.stop()
+                btn_playpause.label.set_text("Play")
+            else:
+                clock.pause()
+                timer.start()
+                btn_playpause.label.set_text("Pause")
+            is_playing = not is_playing
+            plt.draw()
+
+        def slider_update(val):
+            timer.stop()
+            clock.seek(val)
+            draw_frame(clock.tick)
+
+        def speed_update(val):
+            clock.rate = sample_interval * vis.SAMPLES_PER_SECOND * val
+
+        btn_playpause = Button(plt.axes([0.4, 0.02, 0.1, 0.04]), "Pause")
+        btn_playpause.on_clicked(toggle_play)
+        slider = Slider(
+            plt.axes([0.1, 0.02, 0.25, 0.04]),
+            "Game tick",
+            tick_min,
+            max(tick_max, tick_min + 1),
+            valinit=tick_min,
+            valstep=1,
+        )
+        slider.on_changed(slider_update)
+        speed_slider = Slider(
+            plt.axes([0.62, 0.02, 0.25, 0.04]), "Speed", 0.25, 8, valinit=1
+        )
+        speed_slider.on_changed(speed_update)
+
+        plt.show()
+    finally:
+        for worker in workers:
+            worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import bisect
+
+# tick lists per event kind, filled while combatLog and buildings are
+# ingested, so markers such as the game end are lookups instead of scans
+FORT_TARGETS = ("npc_dota_goodguys_fort", "npc_dota_badguys_fort")
+FORT_BUILDING_TYPE = "CDOTA_BaseNPC_Fort"
+
+
+def _append_tick(ticks, tick):
+    # keeps tick lists sorted even if the log is not in tick order
+    if not ticks or ticks[-1] < tick:
+        ticks.append(tick)
+        return
+    position = bisect.bisect_left(ticks, tick)
+    if ticks[position] != tick:
+        ticks.insert(position, tick)
+
+
+class EventIndex:
+    def __init__(self, event_ticks=None, deaths=None, deletions=None, building_types=None):
+        self.event_ticks = event_ticks or {}  # combat log event type -> ticks
+        self.deaths = deaths or {}  # DOTA_COMBATLOG_DEATH target -> ticks
+        self.deletions = deletions or {}  # building entity id -> deleted ticks
+        self.building_types = building_types or {}  # entity id -> buildingType
+
+    def add_combatlog(self, tick, event_type, events):
+        _append_tick(self.event_ticks.setdefault(event_type, []), tick)
+        if event_type == "DOTA_COMBATLOG_DEATH":
+            for event in events:
+                target = event.get("target")
+                if target is not None:
+                    _append_tick(self.deaths.setdefault(target, []), tick)
+
+    def add_building(self, tick, building_id, building_data):
+        building_type = building_data.get("buildingType")
+        if building_type:
+            self.building_types[building_id] = building_type
+        if building_data.get("deleted") is True:
+            _append_tick(self.deletions.setdefault(building_id, []), tick)
+
+    def combatlog_end(self, targets=FORT_TARGETS):
+        # first death tick of any of targets
+        ticks = [
+            self.deaths[target][0] for target in targets if self.deaths.get(target)
+        ]
+        return min(ticks) if ticks else None
+
+    def buildings_end(self, building_type=FORT_BUILDING_TYPE):
+        # last deletion tick of every building whose type matches
+        return {
+            int(building_id): ticks[-1]
+            for building_id, ticks in self.deletions.items()
+            if self.building_types.get(building_id, "").startswith(building_type)
+        }
+
+    def to_json(self):
+        return {
+            "event_ticks": self.event_ticks,
+            "deaths": self.deaths,
+            "deletions": self.deletions,
+            "building_types": self.building_types,
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(**value)
@@ -0,0 +1,255 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+import instrument
+import vis
+from blit_manager import BlitManager
+from map_texture import load_texture
+from replay_cache import open_replay
+
+# headless export of a replay (or a tick range) to MP4, GIF or PNG frames,
+# rendered in parallel chunks and stitched together afterwards
+
+
+def render_frames(log_path, ticks, background_image_path="Game_map_7.33.webp"):
+    # yields the RGBA buffer of every frame; it is reused between frames
+    replay = open_replay(log_path)
+    fig, ax, lines, tick_text, building_layer, creep_layer = vis.setup_plot(
+        replay.heroes,
+        replay.buildings,
+        replay.creeps,
+        background_image_path=background_image_path,
+    )
+    blit_manager = BlitManager(
+        fig.canvas,
+        building_layer.artists()
+        + list(lines.values())
+        + [tick_text, *creep_layer.artists()],
+    )
+    fig.canvas.draw()
+    try:
+        for tick in ticks:
+            vis.animate(
+                tick,
+                lines,
+                replay.heroes,
+                tick_text,
+                creep_layer,
+                replay.creeps,
+                building_layer,
+            )
+            blit_manager.update()
+            yield np.asarray(fig.canvas.buffer_rgba())
+    finally:
+        plt.close(fig)
+
+
+def _ffmpeg():
+    ffmpeg = shutil.which(matplotlib.rcParams["animation.ffmpeg_path"])
+    if ffmpeg is None:
+        raise RuntimeError("MP4 export needs ffmpeg on the PATH")
+    return ffmpeg
+
+
+def _write_mp4(rgba_frames, output_file, fps):
+    process = None
+    for rgba in rgba_frames:
+        if process is None:
+            height, width = rgba.shape[:2]
+            process = subprocess.Popen(
+                [
+                    _ffmpeg(),
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "rgba",
+                    "-s",
+                    f"{width}x{height}",
+                    "-r",
+                    str(fps),
+                    "-i",
+                    "-",
+                    "-vf",
+                    "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    "-c:v",
+                    "libx264",
+                    "-pix_fmt",
+                    "yuv420p",
+                    output_file,
+                ],
+                stdin=subprocess.PIPE,
+            )
+        process.stdin.write(rgba.tobytes())
+    if process is not None:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {output_file}")
+
+
+@instrument.traced("render_chunk")
+def _render_chunk(task):
+    log_path, first_frame, ticks, output_format, target, fps, background = task
+    rgba_frames = render_frames(log_path, ticks, background)
+    frames = range(first_frame, first_frame + len(ticks))
+    if output_format == "mp4":
+        _write_mp4(rgba_frames, target, fps)
+    elif output_format == "gif":
+        # quantized here the way the GIF writer would, and kept as palette
+        # PNGs (a fraction of raw RGB) until the GIF is stitched
+        for frame, rgba in zip(frames, rgba_frames):
+            Image.fromarray(rgba[..., :3]).convert(
+                "P", palette=Image.Palette.ADAPTIVE
+            ).save(os.path.join(target, f"frame_{frame:06d}.png"), compress_level=1)
+    else:
+        for frame, rgba in zip(frames, rgba_frames):
+            Image.fromarray(rgba).save(
+                os.path.join(target, f"frame_{frame:06d}.png"), compress_level=1
+            )
+    return target
+
+
+def _output_format(output):
+    extension = os.path.splitext(output)[1].lower()
+    if extension in (".mp4", ".gif"):
+        return extension[1:]
+    return "png"
+
+
+def _concat_mp4(parts, output, scratch):
+    list_file = os.path.join(scratch, "parts.txt")
+    with open(list_file, "w", encoding="utf-8") as file:
+        for part in parts:
+            file.write(f"file '{os.path.abspath(part)}'\n")
+    subprocess.run(
+        [_ffmpeg(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0"]
+        + ["-i", list_file, "-c", "copy", output],
+        check=True,
+    )
+
+
+def _stitch_gif(frame_dir, output, fps):
+    paths = sorted(path for path in os.listdir(frame_dir) if path.endswith(".png"))
+    if not paths:
+        return
+    images = (Image.open(os.path.join(frame_dir, path)) for path in paths)
+    first = next(images)
+    first.save(
+        output,
+        save_all=True,
+        append_images=images,
+        duration=int(1000 / fps),
+        loop=0,
+    )
+
+
+def export_replay(
+    log_path,
+    output,
+    start=None,
+    stop=None,
+    step=None,
+    fps=vis.SAMPLES_PER_SECOND,
+    workers=None,
+    background_image_path="Game_map_7.33.webp",
+    on_progress=None,
+):
+    # start/stop/step are game ticks, by default one frame per log sample.
+    # Opening the replay and the map here builds their caches once for all
+    # the workers. on_progress(fraction) is called as rendered chunks come back.
+    replay = open_replay(log_path)
+    if background_image_path:
+        load_texture(background_image_path)
+    tick_min, tick_max = replay.heroes.tick_range() or (0, 0)
+    start = tick_min if start is None else start
+    stop = tick_max + 1 if stop is None else stop
+    step = step or replay.heroes.sample_interval()
+
+    output_format = _output_format(output)
+    frames = np.arange(start, stop, step)
+    chunks = np.array_split(frames, workers or os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        tasks = []
+        first_frame = 0
+        for i, chunk in enumerate(chunks):
+            if not len(chunk):
+                continue
+            if output_format == "mp4":
+                target = os.path.join(scratch, f"part_{i:04d}.mp4")
+            elif output_format == "gif":
+                target = scratch
+            else:
+                os.makedirs(output, exist_ok=True)
+                target = output
+            tasks.append(
+                (
+                    log_path,
+                    first_frame,
+                    chunk.tolist(),
+                    output_format,
+                    target,
+                    fps,
+                    background_image_path,
+                )
+            )
+            first_frame += len(chunk)
+
+        with ProcessPoolExecutor(max_workers=max(len(tasks), 1)) as pool:
+            futures = [pool.submit(_render_chunk, task) for task in tasks]
+            for done, _ in enumerate(as_completed(futures), 1):
+                if on_progress is not None:
+                    # stitching the parts is the last step
+                    on_progress(0.9 * done / len(futures))
+            parts = [future.result() for future in futures]
+
+        if output_format == "mp4" and parts:
+            _concat_mp4(parts, output, scratch)
+        elif output_format == "gif":
+            _stitch_gif(scratch, output, fps)
+
+    print(f"Rendered {len(frames)} frames to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a replay without a display")
+    parser.add_argument("log", help="*_combined_log.json file")
+    parser.add_argument("output", help="file.mp4, file.gif or a directory for PNGs")
+    parser.add_argument("--start", type=float, default=None, help="first tick")
+    parser.add_argument("--stop", type=float, default=None, help="last tick (excl.)")
+    parser.add_argument("--step", type=float, default=None, help="ticks per frame")
+    parser.add_argument("--fps", type=float, default=vis.SAMPLES_PER_SECOND)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--background", default="Game_map_7.33.webp")
+    args = parser.parse_args()
+
+    try:
+        export_replay(
+            args.log,
+            args.output,
+            start=args.start,
+            stop=args.stop,
+            step=args.step,
+            fps=args.fps,
+            workers=args.workers,
+            background_image_path=args.background,
+        )
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+
+import vis
+from batch_items import find_logs, match_id
+from ingest import NO_POSITION
+from map_texture import MAP_EXTENT, MapLayer, load_texture
+from replay_cache import open_replay
+from replay_stream import iter_records
+
+# hero position heatmaps over many matches: fixed-resolution grids per hero,
+# per team and per time window, accumulated match by match and merged across
+# worker processes. Grids are stored as [y, x] counts over MAP_EXTENT, the
+# area the map image covers, so they line up with it under
+# imshow(origin="lower").
+HEATMAP_BINS = 128
+WINDOW_TICKS = 18000  # 10 minutes at 30 ticks per second
+
+
+class Heatmaps:
+    def __init__(
+        self, bins=HEATMAP_BINS, window_ticks=WINDOW_TICKS, extent=MAP_EXTENT
+    ):
+        self.bins = bins
+        self.window_ticks = window_ticks
+        self.extent = tuple(float(value) for value in extent)
+        # ("hero", hero_name, window) / ("team", team, window) -> uint32 grid
+        self.grids = {}
+        self.matches = 0
+
+    def _add(self, key, grid):
+        current = self.grids.get(key)
+        if current is None:
+            self.grids[key] = grid
+        else:
+            current += grid
+
+    def add_tracks(self, store):
+        # one match worth of hero tracks, e.g. from vis.process_hero_data
+        x_min, x_max, y_min, y_max = self.extent
+        teams = store.teams().tolist()
+        for entity, name in enumerate(store.names):
+            track = store.track(entity)
+            # samples from before the hero had a position are no visits
+            placed = (track["x"] != NO_POSITION[0]) | (track["y"] != NO_POSITION[1])
+            track = track[placed]
+            if len(track) == 0:
+                continue
+            windows = track["tick"] // self.window_ticks
+            for window in np.unique(windows).tolist():
+                samples = track[windows == window]
+                # anything off the map counts in its edge cells, not nowhere
+                counts, _, _ = np.histogram2d(
+                    np.clip(samples["y"], y_min, y_max),
+                    np.clip(samples["x"], x_min, x_max),
+                    bins=self.bins,
+                    range=((y_min, y_max), (x_min, x_max)),
+                )
+                grid = counts.astype(np.uint32)
+                self._add(("hero", name, window), grid)
+                self._add(("team", teams[entity], window), grid.copy())
+        self.matches += 1
+
+    def merge(self, other):
+        if (other.bins, other.window_ticks, other.extent) != (
+            self.bins,
+            self.window_ticks,
+            self.extent,
+        ):
+            raise ValueError("Heatmaps with different grids cannot be merged")
+        for key, grid in other.grids.items():
+            self._add(key, grid)
+        self.matches += other.matches
+        return self
+
+    def grid(self, kind, name, windows=None):
+        # sum over the given windows (all of them by default)
+        total = np.zeros((self.bins, self.bins), dtype=np.uint32)
+        for key_kind, key_name, window in self.grids:
+            if key_kind == kind and key_name == name:
+                if windows is None or window in windows:
+                    total += self.grids[key_kind, key_name, window]
+        return total
+
+    def save(self, path):
+        keys = list(self.grids)
+        meta = {
+            "bins": self.bins,
+            "window_ticks": self.window_ticks,
+            "extent": self.extent,
+            "matches": self.matches,
+            "keys": keys,
+        }
+        grids = (
+            np.stack([self.grids[key] for key in keys])
+            if keys
+            else np.zeros((0, self.bins, self.bins), dtype=np.uint32)
+        )
+        np.savez_compressed(path, grids=grids, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            heatmaps = cls(meta["bins"], meta["window_ticks"], meta["extent"])
+            heatmaps.matches = meta["matches"]
+            heatmaps.grids = {
+                tuple(key): grid for key, grid in zip(meta["keys"], data["grids"])
+            }
+        return heatmaps
+
+
+def match_heatmaps(
+    log_path, bins=HEATMAP_BINS, window_ticks=WINDOW_TICKS, use_cache=True
+):
+    if use_cache:
+        heroes = open_replay(log_path).heroes
+    else:
+        heroes = vis.process_hero_data(iter_records(log_path, "heroes"))
+    heatmaps = Heatmaps(bins, window_ticks)
+    heatmaps.add_tracks(heroes)
+    return heatmaps
+
+
+def aggregate(
+    logs, bins=HEATMAP_BINS, window_ticks=WINDOW_TICKS, workers=None, use_cache=True
+):
+    total = Heatmaps(bins, window_ticks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                match_heatmaps, log_path, bins, window_ticks, use_cache
+            ): log_path
+            for log_path in logs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            log_path = futures[future]
+            try:
+                total.merge(future.result())
+            except Exception as e:
+                print(f"[{done}/{len(logs)}] {log_path} failed: {str(e)}")
+                continue
+            print(f"[{done}/{len(logs)}] {match_id(log_path)}")
+    return total
+
+
+def plot_heatmap(
+    heatmaps, kind, name, windows=None, background_image_path="Game_map_7.33.webp"
+):
+    grid = heatmaps.grid(kind, name, windows)
+    x_min, x_max, y_min, y_max = heatmaps.extent
+    rows, columns = np.nonzero(grid)
+    if len(rows):
+        # limits from the occupied cells, the same way setup_plot uses the
+        # data bounds of one match
+        cell_x = (x_max - x_min) / heatmaps.bins
+        cell_y = (y_max - y_min) / heatmaps.bins
+        limits = vis.data_limits(
+            [
+                (
+                    x_min + columns.min() * cell_x,
+                    x_min + (columns.max() + 1) * cell_x,
+                    y_min + rows.min() * cell_y,
+                    y_min + (rows.max() + 1) * cell_y,
+                )
+            ]
+        )
+    else:
+        limits = vis.data_limits([])
+
+    fig, ax = plt.subplots(figsize=(9, 9))
+    if background_image_path:
+        MapLayer(ax, load_texture(background_image_path))
+    if len(rows):
+        ax.imshow(
+            np.ma.masked_equal(grid, 0),
+            extent=heatmaps.extent,
+            origin="lower",
+            cmap="inferno",
+            norm=LogNorm(vmin=1, vmax=grid.max()),
+            alpha=0.7,
+            aspect="auto",
+        )
+    ax.set_xlim(limits[0] - 100, limits[1] + 100)
+    ax.set_ylim(limits[2] - 100, limits[3] + 100)
+    ax.set_xlabel("X Position")
+    ax.set_ylabel("Y Position")
+    ax.set_title(f"{kind} {name} ({heatmaps.matches} matches)")
+    return fig, ax
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hero position heatmaps")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="aggregate combined logs")
+    build.add_argument(
+        "inputs", nargs="+", help="directories or globs of *_combined_log.json files"
+    )
+    build.add_argument("--output", default="heatmaps.npz")
+    build.add_argument(
+        "--merge", default=None, help="add to an existing heatmaps file"
+    )
+    build.add_argument("--bins", type=int, default=HEATMAP_BINS)
+    build.add_argument("--window-ticks", type=int, default=WINDOW_TICKS)
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--no-cache", action="store_true")
+
+    show = commands.add_parser("show", help="draw one heatmap")
+    show.add_argument("heatmaps")
+    group = show.add_mutually_exclusive_group(required=True)
+    group.add_argument("--hero", help="hero name, e.g. CDOTA_Unit_Hero_Axe")
+    group.add_argument("--team", type=int)
+    show.add_argument("--window", type=int, action="append", help="time window(s)")
+    show.add_argument("--background", default="Game_map_7.33.webp")
+    show.add_argument(
+        "--save", default=None, help="write an image instead of showing"
+    )
+    args = parser.parse_args()
+
+    if args.command == "build":
+        logs = find_logs(args.inputs)
+        if not logs:
+            print("No combined logs found.")
+            return
+        heatmaps = aggregate(
+            logs, args.bins, args.window_ticks, args.workers, not args.no_cache
+        )
+        if args.merge:
+            heatmaps = Heatmaps.load(args.merge).merge(heatmaps)
+        heatmaps.save(args.output)
+        print(f"{len(heatmaps.grids)} grids from {heatmaps.matches} matches")
+        return
+
+    heatmaps = Heatmaps.load(args.heatmaps)
+    kind, name = ("hero", args.hero) if args.hero else ("team", args.team)
+    fig, _ = plot_heatmap(heatmaps, kind, name, args.window, args.background)
+    if args.save:
+        fig.savefig(args.save)
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
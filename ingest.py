@@ -0,0 +1,198 @@
+import instrument
+from building_store import BuildingBuilder
+from combat_log import CombatLogBuilder
+from event_index import EventIndex
+from item_store import ItemBuilder
+from replay_stream import is_ndjson, iter_sections
+from track_store import TrackBuilder
+
+# per-section builders fed one (tick, entity_id, record) event at a time
+
+# where a hero without any position yet is put (off in a map corner)
+NO_POSITION = (8000, 8000)
+
+
+class HeroIngest:
+    section = "heroes"
+
+    def __init__(self, builder=None):
+        # builder: TrackBuilder, or anything with the same add/build, such as
+        # live.LiveTracks
+        self.builder = builder if builder is not None else TrackBuilder()
+        self.last_positions = {}
+        self.teams = {}
+        # the static "-1" block (teamNum, playerID, ...) per hero
+        self.info = {}
+
+    def add(self, tick, hero_name, hero_data):
+        if tick == -1:
+            self.teams[hero_name] = hero_data.get("teamNum", 0)
+            self.info[hero_name] = hero_data
+            return
+
+        position = hero_data.get("position")
+        if position:
+            x, y = position.get("x", 0), position.get("y", 0)
+            self.last_positions[hero_name] = (x, y)
+        else:
+            x, y = self.last_positions.get(hero_name, NO_POSITION)
+
+        self.builder.add(tick, hero_name, x, y)
+
+    def build(self):
+        return self.builder.build(teams=self.teams)
+
+
+class CreepIngest:
+    section = "creeps"
+
+    def __init__(self, builder=None):
+        self.builder = builder if builder is not None else TrackBuilder()
+
+    def add(self, tick, creep_id, creep_data):
+        if creep_data.get("deleted", False):
+            self.builder.mark_death(tick, creep_id)
+            return
+
+        position = creep_data.get("position")
+        if position:
+            x, y = position.get("x", 0), position.get("y", 0)
+            team = creep_data.get("teamNum", 0)
+            self.builder.add(tick, creep_id, x, y, team)
+
+    def build(self):
+        return self.builder.build()
+
+
+class BuildingIngest:
+    section = "buildings"
+
+    def __init__(self, builder=None):
+        self.builder = builder if builder is not None else BuildingBuilder()
+
+    def add(self, tick, building_id, building_data):
+        if building_data.get("deleted", False):
+            self.builder.mark_death(tick, building_id)
+            return
+
+        position = building_data.get("position")
+        if position:
+            self.builder.add(
+                tick,
+                building_id,
+                position.get("x", 0),
+                position.get("y", 0),
+                building_data.get("teamNum", 0),
+                building_data.get("buildingType"),
+            )
+
+    def build(self):
+        return self.builder.build()
+
+
+class ItemIngest:
+    section = "items"
+
+    def __init__(self):
+        self.builder = ItemBuilder()
+
+    def add(self, tick, item_id, item_info):
+        self.builder.add(
+            tick,
+            item_id,
+            owner=item_info.get("playerOwnerID"),
+            name=item_info.get("name"),
+            deleted="deleted" in item_info,
+        )
+
+    def build(self):
+        return self.builder.build()
+
+
+class CombatLogIngest:
+    section = "combatLog"
+
+    def __init__(self):
+        self.builder = CombatLogBuilder()
+
+    def add(self, tick, event_type, events):
+        self.builder.add(tick, event_type, events)
+
+    def build(self):
+        return self.builder.build()
+
+
+class CombatLogEventIngest:
+    section = "combatLog"
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else EventIndex()
+
+    def add(self, tick, event_type, events):
+        self.index.add_combatlog(tick, event_type, events)
+
+    def build(self):
+        return self.index
+
+
+class BuildingEventIngest:
+    section = "buildings"
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else EventIndex()
+
+    def add(self, tick, building_id, building_data):
+        self.index.add_building(tick, building_id, building_data)
+
+    def build(self):
+        return self.index
+
+
+def consume(handler, records):
+    with instrument.span(f"ingest.{handler.section}") as span:
+        count = 0
+        for tick, entity_id, record in records:
+            handler.add(tick, entity_id, record)
+            count += 1
+        span.add(count)
+        with instrument.span(f"build.{handler.section}"):
+            return handler.build()
+
+
+def ingest_file(file_path, handlers, on_read=None, on_built=None):
+    # one pass over the file feeding every handler its own section.
+    # on_read(n) reports characters read; on_built(handler, result) is called
+    # as soon as a handler is built. In a JSON log every section is one
+    # contiguous block, so its handlers are built when the next one starts;
+    # per-tick NDJSON interleaves sections and builds everything at the end.
+    by_section = {}
+    for handler in handlers:
+        by_section.setdefault(handler.section, []).append(handler)
+    contiguous = not is_ndjson(file_path)
+    results = {}
+
+    def build(handler):
+        with instrument.span(f"build.{handler.section}"):
+            result = results[id(handler)] = handler.build()
+        if on_built is not None:
+            on_built(handler, result)
+
+    with instrument.span("ingest_file") as span:
+        count = 0
+        current = None
+        for section, tick, entity_id, record in iter_sections(
+            file_path, by_section, on_read
+        ):
+            if section != current:
+                if contiguous and current is not None:
+                    for handler in by_section[current]:
+                        build(handler)
+                current = section
+            for handler in by_section[section]:
+                handler.add(tick, entity_id, record)
+            count += 1
+        span.add(count)
+    for handler in handlers:
+        if id(handler) not in results:
+            build(handler)
+    return [results[id(handler)] for handler in handlers]
@@ -0,0 +1,238 @@
+import atexit
+import cProfile
+import functools
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import time
+import tracemalloc
+
+# opt-in stage instrumentation, configured by environment variables:
+#   VIS_TRACE=trace.json        Chrome trace (chrome://tracing, Perfetto)
+#   VIS_TRACE=stages.jsonl      one JSON object per stage
+#   VIS_TRACEMALLOC=1           allocation stats per stage (slows things down)
+#   VIS_PROFILE=run.prof        cProfile of the whole run (pstats/snakeviz)
+# Worker processes write next to the main file with their pid added, e.g.
+# trace.12345.json. With nothing set, span() returns a shared no-op.
+TRACE_ENV = "VIS_TRACE"
+TRACEMALLOC_ENV = "VIS_TRACEMALLOC"
+PROFILE_ENV = "VIS_PROFILE"
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, count):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+        self.count = None
+        self.child_peak = 0
+
+    def add(self, count):
+        self.count = (self.count or 0) + count
+
+    def __enter__(self):
+        stack = self.recorder.stack()
+        stack.append(self)
+        if self.recorder.track_memory:
+            self.memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        stack = self.recorder.stack()
+        stack.pop()
+        event = {
+            "name": self.name,
+            "start_us": (self.start - self.recorder.origin) / 1000,
+            "seconds": (end - self.start) / 1e9,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.count is not None:
+            event["count"] = self.count
+        if self.recorder.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # an inner span resets the peak, so it hands its own up
+            peak = max(peak, self.child_peak)
+            event["alloc_bytes"] = current - self.memory
+            event["peak_bytes"] = peak - self.memory
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        if self.args:
+            event["args"] = self.args
+        self.recorder.record(event)
+        return False
+
+
+class Recorder:
+    def __init__(self, path, track_memory=False):
+        self.path = path
+        self.track_memory = track_memory
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self._written = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def reset(self):
+        # after a fork, the parent's events belong to the parent's file
+        self.events = []
+        self._written = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def flush(self):
+        with self._lock:
+            events, self.events = self.events, []
+        if not events:
+            return
+        path = _process_path(self.path)
+        if path.endswith(".json"):
+            trace = [
+                {
+                    "name": event["name"],
+                    "ph": "X",
+                    "ts": event["start_us"],
+                    "dur": event["seconds"] * 1e6,
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "args": {
+                        key: value
+                        for key, value in event.items()
+                        if key in ("count", "alloc_bytes", "peak_bytes", "args")
+                    },
+                }
+                for event in events
+            ]
+            # a second flush of the same process extends its own file
+            if self._written:
+                with open(path, "r", encoding="utf-8") as f:
+                    trace = json.load(f)["traceEvents"] + trace
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": trace}, f)
+        else:
+            with open(path, "a" if self._written else "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+        self._written = True
+
+
+def _process_path(path):
+    if multiprocessing.parent_process() is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+_recorder = None
+_profiler = None
+
+
+def enable(path, track_memory=False):
+    global _recorder
+    _recorder = Recorder(path, track_memory)
+    return _recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+def span(name, **args):
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, args)
+
+
+def count(records):
+    # adds a record count to the innermost open span
+    if _recorder is None:
+        return
+    stack = _recorder.stack()
+    if stack:
+        stack[-1].add(records)
+
+
+def traced(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _Span(_recorder, name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _flush():
+    global _profiler
+    if _recorder is not None:
+        _recorder.flush()
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_process_path(os.environ[PROFILE_ENV]))
+        _profiler = None
+
+
+def _register_flush():
+    atexit.register(_flush)
+    # pool workers leave through multiprocessing's exit hooks, not atexit
+    multiprocessing.util.Finalize(None, _flush, exitpriority=10)
+
+
+def _after_fork(_):
+    # multiprocessing clears the finalizers it inherits in a forked worker
+    global _profiler
+    if _recorder is not None:
+        _recorder.reset()
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    _register_flush()
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV], bool(os.environ.get(TRACEMALLOC_ENV)))
+elif os.environ.get(TRACEMALLOC_ENV):
+    enable("trace.jsonl", track_memory=True)
+if os.environ.get(PROFILE_ENV):
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+if _recorder is not None or _profiler is not None:
+    _register_flush()
+    multiprocessing.util.register_after_fork(_NULL_SPAN, _after_fork)
@@ -1,11 +1,24 @@
 import json
 
+import instrument
+import output_writers
+from replay_cache import open_replay
+
+# .npz layout of item_output: one row per history entry
+HISTORY_COLUMNS = [
+    ("player_id", "int"),
+    ("hero_name", "str"),
+    ("item_id", "str"),
+    ("item_name", "str"),
+    ("tick", "int"),
+    ("status", "str"),
+]
+
 
 # file saves results into json file
 def load_data(file_path):
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return json.load(file)
+        return open_replay(file_path)
     except FileNotFoundError:
         print(f"File {file_path} not found!")
         return None
@@ -14,79 +27,123 @@ def load_data(file_path):
         return None
 
 
-def get_player_id(data):
+@instrument.traced("get_player_id")
+def get_player_id(records):
     heroes_data = {}
 
-    if "heroes" in data and "-1" in data.get("heroes", {}):
-        for hero_name, hero_info in data["heroes"]["-1"].items():
-            player_id = hero_info.get("playerID")
-            if player_id is not None:
-                heroes_data[player_id] = {"hero_name": hero_name, "items": {}}
+    for tick, hero_name, hero_info in records:
+        if tick != -1:
+            continue
+        player_id = hero_info.get("playerID")
+        if player_id is not None:
+            heroes_data[player_id] = {"hero_name": hero_name, "items": {}}
+    instrument.count(len(heroes_data))
     return heroes_data
 
 
-def assign_items(data, heroes_data):
-    if "items" in data:
-        items_data = data["items"]
-        for tick, items_info in items_data.items():
-            for item_id, item_info in items_info.items():
-                player_owner_id = item_info.get("playerOwnerID")
-                if player_owner_id in heroes_data:
-                    hero = heroes_data[player_owner_id]
-                    if str(item_id) not in hero["items"]:
-                        hero["items"][item_id] = {
-                            "name": item_info.get("name", "INCORRECT INFO - CHECK"),
-                            "history": [],
-                        }
-                    if "deleted" in item_info:
-                        status = "deleted"
-                    else:
-                        status = "purchased"
-
-                    hero["items"][item_id]["history"].append(
-                        {"tick": tick, "status": status}
-                    )
+@instrument.traced("assign_items")
+def assign_items(items, heroes_data):
+    # items is an ItemStore: events are already grouped by owner and item,
+    # with integer ticks in order, so each hero only reads its own slice
+    for player_id, hero in heroes_data.items():
+        events = items.owner_events(player_id)
+        instrument.count(len(events))
+        current_item = None
+        for tick, item, name, deleted in zip(
+            events["tick"].tolist(),
+            events["item"].tolist(),
+            events["name"].tolist(),
+            events["deleted"].tolist(),
+        ):
+            if item != current_item:
+                current_item = item
+                history = []
+                hero["items"][items.ids[item]] = {
+                    "name": items.name(name, "INCORRECT INFO - CHECK"),
+                    "history": history,
+                }
+            status = "deleted" if deleted else "purchased"
+            history.append({"tick": tick, "status": status})
+
+
+def heroes_items(replay):
+    # player id -> {"hero_name", "items"} straight from a parsed Replay
+    heroes_data = get_player_id(replay.hero_info_records())
+    assign_items(replay.items, heroes_data)
+    return heroes_data
 
 
-def print_heroes_data(heroes_data, output_file="item_output.json"):
-    output_data = {}
+def iter_heroes_output(heroes_data, verbose=True):
+    # (player_id, entry) pairs of item_output, one hero at a time
     for player_id, hero_info in heroes_data.items():
-        print(f"Hero: {hero_info['hero_name']} (PlayerID: {player_id})")
-        output_data[player_id] = {
-            "hero_name": hero_info["hero_name"],
-            "items": {},
-        }
+        if verbose:
+            print(f"Hero: {hero_info['hero_name']} (PlayerID: {player_id})")
+        entry = {"hero_name": hero_info["hero_name"], "items": {}}
         items = hero_info["items"]
 
         if not items:
-            print("  No items purchased")
-            output_data[player_id][:"items"] = "No items purchased"
+            if verbose:
+                print("  No items purchased")
+            entry["items"] = "No items purchased"
+            yield player_id, entry
             continue
 
         for item_id, item_data in items.items():
             #            print(f"  Item {item_id}: {item_data['name']}")
-            output_data[player_id]["items"][item_id] = {
+            # assign_items already keeps every history in tick order
+            history = item_data["history"]
+            entry["items"][item_id] = {
                 "name": item_data["name"],
-                "history": [],
+                "history": [
+                    {"tick": event["tick"], "status": event["status"]}
+                    for event in history
+                ]
+                or "No history recorded",
             }
-            history_sorted = sorted(item_data["history"], key=lambda x: x["tick"])
 
-            if not history_sorted:
-                #                print("  No history recorded")
-                output_data[player_id]["items"][item_id]["history"] = (
-                    "No history recorded"
-                )
-                continue
+        #        print("-" * 40)
+        yield player_id, entry
+
 
-            for entry in history_sorted:
-                #                print(f"    Tick {entry['tick']}: {entry['status']}")
-                output_data[player_id]["items"][item_id]["history"].append(
-                    {"tick": entry["tick"], "status": entry["status"]}
-                )
+@instrument.traced("heroes_output")
+def heroes_output(heroes_data, verbose=True):
+    return dict(iter_heroes_output(heroes_data, verbose))
 
-    #        print("-" * 40)
-    with open(output_file, "w") as f:
-        json.dump(output_data, f, indent=1)
+
+def history_rows(player_id, entry):
+    items = entry["items"]
+    if not isinstance(items, dict):  # "No items purchased"
+        return
+    for item_id, item in items.items():
+        if not isinstance(item["history"], list):  # "No history recorded"
+            continue
+        for event in item["history"]:
+            yield (
+                player_id,
+                entry["hero_name"],
+                item_id,
+                item["name"],
+                event["tick"],
+                event["status"],
+            )
+
+
+def write_heroes_output(entries, output_file, compress=False):
+    # entries: (player_id, entry) pairs; the format follows output_file's
+    # extension (.json, .ndjson, .npz, optionally .gz/.bz2/.xz)
+    output_writers.write_entries(
+        output_file,
+        entries,
+        key_name="player_id",
+        columns=HISTORY_COLUMNS,
+        rows=history_rows,
+        compress=compress,
+    )
+
+
+def print_heroes_data(heroes_data, output_file="item_output.json"):
+    with instrument.span("serialize", file=output_file):
+        write_heroes_output(iter_heroes_output(heroes_data), output_file)
 
     print(f"Data written to {output_file}")
 
@@ -98,8 +155,7 @@ def main():
             print("Failed to load data file.")
             return
 
-        heroes_data = get_player_id(data)
-        assign_items(data, heroes_data)
+        heroes_data = heroes_items(data)
 
         if not heroes_data:
             print("No hero data found in the log.")
@@ -0,0 +1,94 @@
+from array import array
+
+import numpy as np
+
+# columnar storage for item events, one row per (tick, item) record
+ITEM_DTYPE = np.dtype(
+    [
+        ("tick", np.int32),
+        ("item", np.int32),
+        ("owner", np.int32),
+        ("name", np.int32),
+        ("deleted", np.bool_),
+    ]
+)
+NO_OWNER = np.iinfo(np.int32).min
+
+
+class ItemStore:
+    def __init__(self, ids, names, events, owners=None, offsets=None):
+        # events["item"] indexes ids, events["name"] indexes names (-1: none).
+        # events are sorted by (owner, item, tick); rows of owners[i] live in
+        # events[offsets[i]:offsets[i + 1]]
+        self.ids = list(ids)
+        self.names = list(names)
+        self.events = events
+        if owners is None:
+            owners, starts = np.unique(events["owner"], return_index=True)
+            offsets = np.append(starts, len(events))
+        self.owners = owners
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.events)
+
+    def owner_events(self, owner):
+        position = np.searchsorted(self.owners, owner)
+        if position == len(self.owners) or self.owners[position] != owner:
+            return self.events[:0]
+        return self.events[self.offsets[position] : self.offsets[position + 1]]
+
+    def name(self, name_index, default=None):
+        return self.names[name_index] if name_index >= 0 else default
+
+    def records(self):
+        # (tick, item_id, record) events shaped like the raw "items" section
+        for tick, item, owner, name, deleted in self.events.tolist():
+            record = {}
+            if owner != NO_OWNER:
+                record["playerOwnerID"] = owner
+            if name >= 0:
+                record["name"] = self.names[name]
+            if deleted:
+                record["deleted"] = True
+            yield tick, self.ids[item], record
+
+
+class ItemBuilder:
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self._id_index = {}
+        self._name_index = {}
+        self._tick = array("i")
+        self._item = array("i")
+        self._owner = array("i")
+        self._name = array("i")
+        self._deleted = array("b")
+
+    def _intern(self, value, table, index):
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(table)
+            table.append(value)
+        return position
+
+    def add(self, tick, item_id, owner=None, name=None, deleted=False):
+        self._tick.append(tick)
+        self._item.append(self._intern(item_id, self.ids, self._id_index))
+        self._owner.append(NO_OWNER if owner is None else owner)
+        self._name.append(
+            -1 if name is None else self._intern(name, self.names, self._name_index)
+        )
+        self._deleted.append(deleted)
+
+    def build(self):
+        events = np.empty(len(self._tick), dtype=ITEM_DTYPE)
+        events["tick"] = np.frombuffer(self._tick, dtype=np.int32)
+        events["item"] = np.frombuffer(self._item, dtype=np.int32)
+        events["owner"] = np.frombuffer(self._owner, dtype=np.int32)
+        events["name"] = np.frombuffer(self._name, dtype=np.int32)
+        events["deleted"] = np.frombuffer(self._deleted, dtype=np.int8).astype(bool)
+        # item indexes follow first appearance, so items keep their log order
+        events = events[np.lexsort((events["tick"], events["item"], events["owner"]))]
+        return ItemStore(self.ids, self.names, events)
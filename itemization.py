@@ -1,77 +1,147 @@
-import json
-from collections import defaultdict
-import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import build_orders
+import instrument
+import item_history
+import output_writers
+from batch_items import find_logs, match_id
+from build_orders import BuildOrdersBuilder, PopularBuilds
+from replay_cache import open_replay
+
+# .npz layouts: one row per purchase, and one per popular item of a minute
+BUILD_COLUMNS = [("hero", "str"), ("minute", "int"), ("item", "str")]
+POPULAR_COLUMNS = [
+    ("hero", "str"),
+    ("minute", "int"),
+    ("hero_matches", "int"),
+    ("item", "str"),
+    ("item_matches", "int"),
+]
 
 #saves itemization into txt and json files
-def load_data(file_path):
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        print(f"File {file_path} not found!")
-        return None
-    except json.JSONDecodeError:
-        print(f"Failed to decode JSON from file {file_path}")
-        return None
-
-
-def clean_item_name(item_name):
-    return re.sub(r"CDOTA_Item_|(\(\d+\).*)", "", item_name)
-
-
+@instrument.traced("list_player_items")
 def list_player_items(
     data, output_txt="itemization.txt", output_json="itemization.json"
 ):
-    hero_items = defaultdict(list)
-
-    for hero_data in data.values():
-        hero_name = hero_data["hero_name"].replace("CDOTA_Unit_Hero_", "")
+    # data: item_history entries ({"hero_name", "items"}), e.g. from a saved
+    # item_output.json
+    builder = BuildOrdersBuilder()
+    for hero_data in data:
+        if not isinstance(hero_data["items"], dict):  # "No items purchased"
+            continue
         for item in hero_data["items"].values():
-            item_name = clean_item_name(item["name"])  # .replace("CDOTA_Item_", "")
             for event in item["history"]:
                 if event["status"] == "purchased":
-                    minute = int(event["tick"]) // 60
-                    hero_items[hero_name].append((minute, item_name))
-
-    output = []
-    for hero, items in hero_items.items():
-        items.sort()
-        grouped_items = defaultdict(list)
-        for minute, item in items:
-            grouped_items[minute].append(item)
-
-        hero_data = {"hero": hero, "items": []}
-        for minute, item_names in grouped_items.items():
-            hero_data["items"].append({"minute": minute, "items": item_names})
-        output.append(hero_data)
-
-    formatted_output = ""
-    for hero_data in output:
-        formatted_output += f"\n {hero_data['hero']}: "
-        item_strings = []
-        for item_info in hero_data["items"]:
-            item_strings.append(
-                f"\n min {item_info['minute']} > {', '.join(item_info['items'])}"
-            )
-        formatted_output += " ".join(item_strings) + "\n"
+                    builder.add(hero_data["hero_name"], event["tick"], item["name"])
+    write_build_orders(builder.build(), output_txt, output_json)
 
-#    print(formatted_output)
 
-    with open(output_txt, "w") as f:
-        f.write(formatted_output)
-    with open(output_json, "w") as f:
-        json.dump(output, f, indent=1)
+def write_build_orders(
+    builds, output_txt="itemization.txt", output_json="itemization.json"
+):
+    # rendering is the only step that touches the names again; both files
+    # are written one hero at a time. output_json may be .json, .ndjson or
+    # .npz, optionally compressed.
+    with instrument.span("serialize", file=output_json):
+        with open(output_txt, "w") as f:
+            f.writelines(builds.iter_text())
+        output_writers.write_entries(
+            output_json,
+            ((record["hero"], record) for record in builds.iter_json()),
+            array=True,
+            line=_record_line,
+            columns=BUILD_COLUMNS,
+            rows=_build_rows,
+        )
 
     print(f"Data written to {output_txt}")
 
 
+def _record_line(key, record):
+    return record
+
+
+def _build_rows(hero, record):
+    for group in record["items"]:
+        for item in group["items"]:
+            yield hero, group["minute"], item
+
+
+def _popular_line(hero, minutes):
+    return {"hero": hero, "minutes": minutes}
+
+
+def _popular_rows(hero, minutes):
+    for group in minutes:
+        for item in group["items"]:
+            yield (
+                hero,
+                group["minute"],
+                group["matches"],
+                item["item"],
+                item["matches"],
+            )
+
+
+def match_build_orders(log_path):
+    replay = open_replay(log_path)
+    heroes_data = item_history.get_player_id(replay.hero_info_records())
+    return build_orders.from_item_store(replay.items, heroes_data)
+
+
+def popular_builds(logs, workers=None):
+    popular = PopularBuilds()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(match_build_orders, log_path): log_path for log_path in logs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            log_path = futures[future]
+            try:
+                popular.add(future.result())
+            except Exception as e:
+                print(f"[{done}/{len(logs)}] {log_path} failed: {str(e)}")
+                continue
+            print(f"[{done}/{len(logs)}] {match_id(log_path)}")
+    return popular
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Item build orders")
+    parser.add_argument(
+        "--popular",
+        nargs="+",
+        default=None,
+        help="directories or globs of combined logs to aggregate",
+    )
+    parser.add_argument("--output", default="popular_builds.json")
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.popular:
+        logs = find_logs(args.popular)
+        if not logs:
+            print("No combined logs found.")
+            return
+        popular = popular_builds(logs, args.workers)
+        output_writers.write_entries(
+            args.output,
+            popular.popular(args.top).items(),
+            line=_popular_line,
+            columns=POPULAR_COLUMNS,
+            rows=_popular_rows,
+        )
+        print(f"Popular builds of {popular.matches} matches written to {args.output}")
+        return
+
     try:
-        data = load_data("item_output.json")
-        if data is None:
-            print("Failed to load data file.")
+        replay = item_history.load_data("8188745568_1293535117_combined_log.json")
+        if replay is None:
             return
-        list_player_items(data)
+        heroes_data = item_history.get_player_id(replay.hero_info_records())
+        write_build_orders(build_orders.from_item_store(replay.items, heroes_data))
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
@@ -1,37 +1,36 @@
 import json
 
+from replay_cache import open_replay
+
 
 # file only prints results
 def load_data(filepath):
     try:
-        with open(filepath, "r", encoding="utf-8") as file:
-            data = json.load(file)
-        return data
+        return open_replay(filepath)
     except (FileNotFoundError, json.JSONDecodeError) as error:
         print(f"Error loading JSON file: {error}")
         return None
 
 
-def get_player_id(data):
+def get_player_id(records):
     heroes_data = {}
-    if "heroes" in data and "-1" in data["heroes"]:
-        for hero_name, hero_info in data["heroes"]["-1"].items():
-            player_id = hero_info.get("playerID")
-            if player_id is not None:
-                heroes_data[player_id] = {"hero_name": hero_name, "items": []}
+    for tick, hero_name, hero_info in records:
+        if tick != -1:
+            continue
+        player_id = hero_info.get("playerID")
+        if player_id is not None:
+            heroes_data[player_id] = {"hero_name": hero_name, "items": []}
     print(heroes_data)
     return heroes_data
 
 
-def assign_items(data, heroes_data):
-    if "items" in data:
-        for tick, items_info in data["items"].items():
-            for item_id, item_info in items_info.items():
-                player_owner_id = item_info.get("playerOwnerID")
-                if player_owner_id in heroes_data:
-                    heroes_data[player_owner_id]["items"].append(
-                        {"tick": int(tick), "item": item_info.get("name", None)}
-                    )
+def assign_items(records, heroes_data):
+    for tick, item_id, item_info in records:
+        player_owner_id = item_info.get("playerOwnerID")
+        if player_owner_id in heroes_data:
+            heroes_data[player_owner_id]["items"].append(
+                {"tick": tick, "item": item_info.get("name", None)}
+            )
 
 
 def print_heroes_data(heroes_data):
@@ -43,12 +42,14 @@ def print_heroes_data(heroes_data):
 
 
 def main():
-    data = load_data("8182713861_1523041035_combined_log.json")
-    if data is None:
+    file_path = "8182713861_1523041035_combined_log.json"
+
+    replay = load_data(file_path)
+    if replay is None:
         return
 
-    heroes_data = get_player_id(data)
-    assign_items(data, heroes_data)
+    heroes_data = get_player_id(replay.hero_info_records())
+    assign_items(replay.items.records(), heroes_data)
     print_heroes_data(heroes_data)
 
 
@@ -0,0 +1,268 @@
+import argparse
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+import item_history
+import vis
+from blit_manager import BlitManager
+from ingest import CreepIngest, HeroIngest
+from replay_stream import LogTail
+from track_store import NO_TICK, TRACK_DTYPE
+
+# follow a combined log while the match is still being parsed. The log is
+# per-tick NDJSON (see replay_stream.ndjson_sections); every update reads only
+# the lines appended since the last one and applies them to running state, so
+# its cost depends on the new ticks, not on how long the match already is.
+POLL_INTERVAL_MS = 500
+
+
+class LiveTracks:
+    # latest (and previous) sample of every entity, updated in place; takes
+    # the place of TrackBuilder in HeroIngest/CreepIngest and answers the
+    # TrackStore queries the viewer makes
+    def __init__(self):
+        self.names = []
+        self._index = {}
+        self._current = np.zeros(0, dtype=TRACK_DTYPE)
+        self._previous = np.zeros(0, dtype=TRACK_DTYPE)
+        self._spawns = np.zeros(0, dtype=np.int32)
+        self.deaths = np.zeros(0, dtype=np.int32)
+        self._team_overrides = {}
+        self._bounds = None
+        self._ticks = None
+        self._interval = 1.0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def _entity(self, name):
+        entity = self._index.get(name)
+        if entity is not None:
+            return entity
+        entity = self._index[name] = len(self.names)
+        self.names.append(name)
+        if entity == len(self._current):
+            # capacity doubles, so growing stays amortized O(1) per entity
+            capacity = max(2 * entity, 16)
+            self._current = np.resize(self._current, capacity)
+            self._previous = np.resize(self._previous, capacity)
+            self._spawns = np.resize(self._spawns, capacity)
+            self.deaths = np.resize(self.deaths, capacity)
+        self._spawns[entity] = NO_TICK
+        self.deaths[entity] = NO_TICK
+        return entity
+
+    def add(self, tick, name, x, y, team=0):
+        entity = self._entity(name)
+        sample = (tick, entity, x, y, team)
+        if self._spawns[entity] == NO_TICK:
+            self._spawns[entity] = tick
+            self._previous[entity] = sample
+        else:
+            last_tick = int(self._current["tick"][entity])
+            if tick > last_tick:
+                self._interval = float(tick - last_tick)
+            self._previous[entity] = self._current[entity]
+        self._current[entity] = sample
+
+        if self._bounds is None:
+            self._bounds = [x, x, y, y]
+            self._ticks = [tick, tick]
+            return
+        bounds, ticks = self._bounds, self._ticks
+        bounds[0], bounds[1] = min(bounds[0], x), max(bounds[1], x)
+        bounds[2], bounds[3] = min(bounds[2], y), max(bounds[3], y)
+        ticks[0], ticks[1] = min(ticks[0], tick), max(ticks[1], tick)
+
+    def mark_death(self, tick, name):
+        self.deaths[self._entity(name)] = tick
+
+    def build(self, teams=None):
+        if teams:
+            self._team_overrides = dict(teams)
+        return self
+
+    def teams(self):
+        count = len(self.names)
+        teams = self._current["team"][:count].copy()
+        for entity, name in enumerate(self.names):
+            if name in self._team_overrides:
+                teams[entity] = self._team_overrides[name]
+        return teams
+
+    def alive_at(self, tick):
+        count = len(self.names)
+        return np.flatnonzero(
+            (self._spawns[:count] <= tick) & (self.deaths[:count] > tick)
+        )
+
+    def positions_at(self, tick, interpolate=False):
+        entities = self.alive_at(tick)
+        current, previous = self._current[entities], self._previous[entities]
+        newer = current["tick"] > tick
+        rows = np.where(newer, previous, current)
+        if interpolate:
+            span = (current["tick"] - previous["tick"]).astype(np.float32)
+            weight = np.where(
+                newer, (tick - previous["tick"]) / np.where(span > 0, span, 1), 0
+            ).astype(np.float32)
+            rows["x"] += weight * (current["x"] - previous["x"])
+            rows["y"] += weight * (current["y"] - previous["y"])
+        if self._team_overrides:
+            rows["team"] = self.teams()[rows["entity"]]
+        return rows
+
+    def tick_range(self):
+        return tuple(self._ticks) if self._ticks else None
+
+    def sample_interval(self):
+        return self._interval
+
+    def bounds(self):
+        return tuple(self._bounds) if self._bounds else None
+
+
+class LiveItems:
+    # item_history's heroes_data, extended one item record at a time
+    section = "items"
+
+    def __init__(self):
+        self.heroes_data = {}
+
+    def add(self, tick, item_id, item_info):
+        hero = self.heroes_data.get(item_info.get("playerOwnerID"))
+        if hero is None:
+            return
+        item = hero["items"].get(item_id)
+        if item is None:
+            item = hero["items"][item_id] = {
+                "name": item_info.get("name", "INCORRECT INFO - CHECK"),
+                "history": [],
+            }
+        status = "deleted" if "deleted" in item_info else "purchased"
+        item["history"].append({"tick": tick, "status": status})
+
+    def add_hero(self, hero_name, hero_info):
+        player_id = hero_info.get("playerID")
+        if player_id is not None and player_id not in self.heroes_data:
+            self.heroes_data[player_id] = {"hero_name": hero_name, "items": {}}
+
+    def build(self):
+        return self.heroes_data
+
+
+class LiveReplay:
+    def __init__(self, file_path):
+        self.heroes = HeroIngest(LiveTracks())
+        self.creeps = CreepIngest(LiveTracks())
+        self.items = LiveItems()
+        self.tail = LogTail(file_path, ("heroes", "creeps", "items"))
+        self.tick = None
+
+    def update(self):
+        # applies the lines appended since the last call; returns how many
+        # records they held
+        handlers = {"heroes": self.heroes, "creeps": self.creeps, "items": self.items}
+        count = 0
+        for section, tick, entity_id, record in self.tail.poll():
+            if section == "heroes" and tick == -1:
+                self.items.add_hero(entity_id, record)
+            handlers[section].add(tick, entity_id, record)
+            if tick != -1 and (self.tick is None or tick > self.tick):
+                self.tick = tick
+            count += 1
+        if count:
+            self.heroes.build()
+        return count
+
+    def hero_store(self):
+        return self.heroes.builder
+
+    def creep_store(self):
+        return self.creeps.builder
+
+    def item_output(self):
+        return item_history.heroes_output(self.items.build(), verbose=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a growing per-tick log")
+    parser.add_argument("log", help="per-tick NDJSON combined log")
+    parser.add_argument(
+        "--items", default=None, help="item output written on exit (.json/.ndjson/.npz)"
+    )
+    parser.add_argument("--background", default="Game_map_7.33.webp")
+    args = parser.parse_args()
+
+    matplotlib.use("TkAgg")
+    replay = LiveReplay(args.log)
+    replay.update()
+
+    fig, ax, lines, tick_text, _, creep_layer = vis.setup_plot(
+        replay.hero_store(),
+        None,
+        replay.creep_store(),
+        background_image_path=args.background,
+    )
+    blit_manager = BlitManager(
+        fig.canvas, list(lines.values()) + [tick_text, *creep_layer.artists()]
+    )
+    # setup_plot sized the view to the data there was at startup
+    limits = vis.data_limits(
+        [replay.hero_store().bounds(), replay.creep_store().bounds()]
+    )
+
+    def follow_match():
+        # heroes that joined since the last poll get a marker, and the view
+        # grows with the area the match has covered so far
+        nonlocal limits
+        heroes = replay.hero_store()
+        new = [
+            (name, team)
+            for name, team in zip(heroes.names, heroes.teams())
+            if name not in lines
+        ]
+        for name, team in new:
+            line = vis.hero_lines(ax, [name], [team])[name]
+            blit_manager.add_artist(line, len(lines))
+            lines[name] = line
+        bounds = vis.data_limits([heroes.bounds(), replay.creep_store().bounds()])
+        changed = bool(new)
+        if bounds != limits:
+            limits = bounds
+            vis.set_limits(ax, limits)
+            changed = True
+        if changed:
+            fig.canvas.draw_idle()  # refreshes the cached background
+
+    def poll():
+        if not replay.update() or replay.tick is None:
+            return
+        follow_match()
+        vis.animate(
+            replay.tick,
+            lines,
+            replay.hero_store(),
+            tick_text,
+            creep_layer,
+            replay.creep_store(),
+        )
+        blit_manager.update()
+
+    timer = fig.canvas.new_timer(interval=POLL_INTERVAL_MS)
+    timer.add_callback(poll)
+    timer.start()
+    plt.show()
+
+    if args.items:
+        item_history.write_heroes_output(replay.item_output().items(), args.items)
+        print(f"Data written to {args.items}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from staging import install, make_staging
+
+# the background map, decoded once into <image>.cache/ as mipmap levels
+# (level_0.npy is full size, every next level half as large) that are
+# memory-mapped on load. The map always covers MAP_EXTENT in world units, the
+# place map_extent used to compute for a match spanning the whole map, and
+# only the level and crop that fit the axes are handed to matplotlib.
+MAP_EXTENT = (-9000.0, 9000.0, -8500.0, 9100.0)
+MIN_LEVEL_SIZE = 64
+TEXTURE_VERSION = 1
+
+
+def texture_dir(image_path):
+    return os.fspath(image_path) + ".cache"
+
+
+def build_texture(image_path):
+    image = Image.open(image_path).convert("RGB")
+    levels = [np.asarray(image)]
+    while max(image.size) // 2 >= MIN_LEVEL_SIZE:
+        image = image.reduce(2)  # box filter, each texel averages 2x2
+        levels.append(np.asarray(image))
+
+    stat = os.stat(image_path)
+    directory = texture_dir(image_path)
+    staging = make_staging(directory)
+    for level, pixels in enumerate(levels):
+        np.save(os.path.join(staging, f"level_{level}.npy"), pixels)
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": TEXTURE_VERSION,
+                "levels": len(levels),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            },
+            f,
+        )
+    install(staging, directory, lambda: _read_manifest(image_path) is not None)
+    return levels
+
+
+def _read_manifest(image_path):
+    # the manifest of an up-to-date texture cache, otherwise None
+    try:
+        with open(
+            os.path.join(texture_dir(image_path), "manifest.json"), encoding="utf-8"
+        ) as f:
+            manifest = json.load(f)
+        stat = os.stat(image_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (
+        manifest.get("version") != TEXTURE_VERSION
+        or manifest["size"] != stat.st_size
+        or manifest["mtime_ns"] != stat.st_mtime_ns
+    ):
+        return None
+    return manifest
+
+
+def load_texture(image_path, extent=MAP_EXTENT):
+    manifest = _read_manifest(image_path)
+    if manifest is None:
+        return MapTexture(build_texture(image_path), extent)
+    directory = texture_dir(image_path)
+    levels = [
+        np.load(os.path.join(directory, f"level_{level}.npy"), mmap_mode="r")
+        for level in range(manifest["levels"])
+    ]
+    return MapTexture(levels, extent)
+
+
+class MapTexture:
+    def __init__(self, levels, extent=MAP_EXTENT):
+        self.levels = levels
+        self.extent = extent
+
+    def level_for(self, width_px, height_px, view):
+        # smallest level that still has a texel for every screen pixel
+        x0, x1, y0, y1 = self.extent
+        vx0, vx1, vy0, vy1 = view
+        need_x = width_px * (x1 - x0) / max(vx1 - vx0, 1e-9)
+        need_y = height_px * (y1 - y0) / max(vy1 - vy0, 1e-9)
+        for level in range(len(self.levels) - 1, 0, -1):
+            height, width = self.levels[level].shape[:2]
+            if width >= need_x and height >= need_y:
+                return level
+        return 0
+
+    def crop(self, level, view):
+        # (pixels, extent) of the texels covering view, or None outside the map
+        pixels = self.levels[level]
+        height, width = pixels.shape[:2]
+        x0, x1, y0, y1 = self.extent
+        vx0, vx1, vy0, vy1 = view
+        texel_x = (x1 - x0) / width
+        texel_y = (y1 - y0) / height
+        # one spare texel on each side keeps the edges interpolated
+        c0 = max(int(np.floor((vx0 - x0) / texel_x)) - 1, 0)
+        c1 = min(int(np.ceil((vx1 - x0) / texel_x)) + 1, width)
+        # image rows run from the top of the map down
+        r0 = max(int(np.floor((y1 - vy1) / texel_y)) - 1, 0)
+        r1 = min(int(np.ceil((y1 - vy0) / texel_y)) + 1, height)
+        if c0 >= c1 or r0 >= r1:
+            return None
+        return pixels[r0:r1, c0:c1], (
+            x0 + c0 * texel_x,
+            x0 + c1 * texel_x,
+            y1 - r1 * texel_y,
+            y1 - r0 * texel_y,
+        )
+
+
+class MapLayer:
+    # keeps the drawn image at the level and crop of the current view; only
+    # a zoom, pan or resize touches it, blitted frames never do
+    def __init__(self, ax, texture):
+        self.ax = ax
+        self.texture = texture
+        self._shown = None  # (level, extent) currently drawn
+        self.image = ax.imshow(
+            texture.levels[-1], extent=texture.extent, aspect="auto", zorder=0
+        )
+        # matplotlib only keeps weak references to bound methods
+        ax.callbacks.connect("xlim_changed", lambda _: self.refresh())
+        ax.callbacks.connect("ylim_changed", lambda _: self.refresh())
+        ax.figure.canvas.mpl_connect("resize_event", lambda _: self.refresh())
+
+    def refresh(self):
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        view = (x0, x1, y0, y1)
+        bbox = self.ax.bbox
+        level = self.texture.level_for(bbox.width, bbox.height, view)
+        cropped = self.texture.crop(level, view)
+        if cropped is None:
+            self.image.set_visible(False)
+            self._shown = None
+            return
+        pixels, extent = cropped
+        if self._shown == (level, extent):
+            return
+        self._shown = (level, extent)
+        self.image.set_visible(True)
+        self.image.set_data(pixels)
+        self.image.set_extent(extent)
@@ -0,0 +1,200 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+from array import array
+
+import numpy as np
+
+try:  # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+# streaming writers for script outputs, picked by file name:
+#   out.json     one compact JSON document
+#   out.ndjson   one JSON object per line (.jsonl works too)
+#   out.npz      columnar NumPy arrays, strings interned into tables
+# .gz/.bz2/.xz (and .zst on Python 3.14+) compress json/ndjson output.
+# Entries are written as they are produced, so no output has to be built in
+# memory first; only .npz, being a zip of whole arrays, buffers its columns.
+COMPRESSION_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+FORMATS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".npz": "npz"}
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def open_text(path, mode="wt"):
+    # text file, compressed according to its suffix
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, mode, encoding="utf-8")
+    if path.endswith(".xz"):
+        return lzma.open(path, mode, encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstd is None:
+            raise ValueError("zstd output needs Python 3.14 or newer")
+        return zstd.open(path, mode, encoding="utf-8")
+    return open(path, mode.replace("t", ""), encoding="utf-8")
+
+
+def output_format(path):
+    path = os.fspath(path)
+    for suffix in COMPRESSION_SUFFIXES:
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+            break
+    return FORMATS.get(os.path.splitext(path)[1], "json")
+
+
+class JsonWriter:
+    # entries are (key, value) pairs; a tuple key nests objects, so
+    # ("combatLog", "120") writes {"combatLog": {"120": value}}. Keys must
+    # arrive grouped by their prefixes. With array=True, keys are ignored and
+    # the values form a JSON array.
+    def __init__(self, file, array=False):
+        self.file = file
+        self.array = array
+        self._open = []  # keys of the objects currently open
+        self._first = True
+        file.write("[" if array else "{")
+
+    def write(self, key, value):
+        file = self.file
+        if self.array:
+            file.write(("" if self._first else ",") + _dumps(value))
+            self._first = False
+            return
+
+        path = key if isinstance(key, tuple) else (key,)
+        parents = list(path[:-1])
+        common = 0
+        while (
+            common < len(self._open)
+            and common < len(parents)
+            and self._open[common] == parents[common]
+        ):
+            common += 1
+        if common < len(self._open):
+            file.write("}" * (len(self._open) - common))
+            self._open = self._open[:common]
+            self._first = False
+        for parent in parents[common:]:
+            file.write(("" if self._first else ",") + _dumps(str(parent)) + ":{")
+            self._open.append(parent)
+            self._first = True
+        file.write(
+            ("" if self._first else ",") + _dumps(str(path[-1])) + ":" + _dumps(value)
+        )
+        self._first = False
+
+    def close(self):
+        self.file.write("}" * len(self._open) + ("]" if self.array else "}"))
+        self.file.close()
+
+
+class NdjsonWriter:
+    # one line per entry; line(key, value) shapes it, by default as
+    # {key_name: key, **value}, and may return None to skip the entry
+    def __init__(self, file, key_name="key", line=None):
+        self.file = file
+        self.key_name = key_name
+        self.line = line or self._line
+
+    def _line(self, key, value):
+        if isinstance(value, dict):
+            return {self.key_name: key, **value}
+        return {self.key_name: key, "value": value}
+
+    def write(self, key, value):
+        line = self.line(key, value)
+        if line is not None:
+            self.file.write(_dumps(line) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class NpzWriter:
+    # rows(key, value) yields one tuple per row, matching columns: a list of
+    # (name, "int" | "str" | "json") pairs. str columns are stored as int32
+    # ids plus a <name>_names table; json columns as one uint8 buffer of the
+    # rows' UTF-8 JSON back to back, with row i at
+    # <name>[<name>_offsets[i]:<name>_offsets[i + 1]] (see json_cells).
+    def __init__(self, path, columns, rows, compress=False):
+        self.path = path
+        self.columns = columns
+        self.rows = rows
+        self.compress = compress
+        self._values = [array("q") for _ in columns]
+        self._tables = [{} if kind == "str" else None for _, kind in columns]
+        self._json = [bytearray() if kind == "json" else None for _, kind in columns]
+
+    def write(self, key, value):
+        for row in self.rows(key, value):
+            for i, cell in enumerate(row):
+                table = self._tables[i]
+                if table is not None:
+                    cell = table.setdefault(cell, len(table))
+                elif self._json[i] is not None:
+                    # the offset column holds where each row's JSON ends
+                    self._json[i] += _dumps(cell).encode("utf-8")
+                    cell = len(self._json[i])
+                self._values[i].append(cell)
+
+    def close(self):
+        arrays = {}
+        for (name, kind), values, table, encoded in zip(
+            self.columns, self._values, self._tables, self._json
+        ):
+            column = np.frombuffer(values, dtype=np.int64)
+            if kind == "json":
+                arrays[name] = np.frombuffer(encoded, dtype=np.uint8)
+                arrays[f"{name}_offsets"] = np.concatenate(([0], column))
+                continue
+            if kind == "str":
+                arrays[name] = column.astype(np.int32)
+                arrays[f"{name}_names"] = np.array(
+                    [str(cell) for cell in table], dtype=np.str_
+                )
+            else:
+                arrays[name] = column
+        save = np.savez_compressed if self.compress else np.savez
+        save(self.path, **arrays)
+
+
+def json_cells(arrays, name):
+    # decoded rows of json column name of a loaded .npz
+    buffer, offsets = arrays[name], arrays[f"{name}_offsets"]
+    for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        yield json.loads(buffer[start:end].tobytes())
+
+
+def open_writer(
+    path, key_name="key", array=False, line=None, columns=None, rows=None, compress=False
+):
+    # columns/rows describe the .npz layout; outputs without one cannot be
+    # written as .npz
+    path = os.fspath(path)
+    kind = output_format(path)
+    if kind == "npz":
+        if columns is None:
+            raise ValueError(f"{path}: this output has no columnar layout")
+        return NpzWriter(path, columns, rows, compress)
+    if kind == "ndjson":
+        return NdjsonWriter(open_text(path), key_name, line)
+    return JsonWriter(open_text(path), array)
+
+
+def write_entries(path, entries, **options):
+    # writes (key, value) pairs and closes the writer, even on errors
+    writer = open_writer(path, **options)
+    try:
+        for key, value in entries:
+            writer.write(key, value)
+    finally:
+        writer.close()
@@ -0,0 +1,58 @@
+import argparse
+import os
+
+import build_orders
+import item_history
+import itemization
+import timestamp_fix
+
+# every analysis of one match on a single parsed Replay: item history,
+# itemization and the combat log realignment, without intermediate files
+
+
+def run_pipeline(log_path, output_dir="."):
+    replay = item_history.load_data(log_path)
+    if replay is None:
+        return False
+
+    os.makedirs(output_dir, exist_ok=True)
+    match = os.path.basename(log_path).removesuffix("_combined_log.json")
+
+    heroes_data = item_history.heroes_items(replay)
+    if not heroes_data:
+        print("No hero data found in the log.")
+    else:
+        item_history.print_heroes_data(
+            heroes_data, os.path.join(output_dir, "item_output.json")
+        )
+        itemization.write_build_orders(
+            build_orders.from_item_store(replay.items, heroes_data),
+            os.path.join(output_dir, "itemization.txt"),
+            os.path.join(output_dir, "itemization.json"),
+        )
+
+    combat_log_end_tick = replay.events.combatlog_end()
+    buildings_end_tick = replay.events.buildings_end()
+    if combat_log_end_tick is None or not buildings_end_tick:
+        print("Error: Could not find end ticks.")
+    else:
+        timestamp_fix.offset_combatlog(
+            log_path,
+            replay.combat_log,
+            combat_log_end_tick,
+            buildings_end_tick,
+            os.path.join(output_dir, f"{match}_updated_log.json"),
+        )
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every analysis on one match")
+    parser.add_argument("log", help="*_combined_log.json file")
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args()
+    run_pipeline(args.log, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import time
+
+# playback position in game ticks, advanced by wall-clock time so the speed
+# does not depend on how densely the log was sampled or how fast frames render
+
+
+class PlaybackClock:
+    def __init__(self, start, end, rate, loop=True):
+        self.start = start
+        self.end = end
+        self.rate = rate  # game ticks per wall-clock second
+        self.loop = loop
+        self.tick = start
+        self._last_time = None
+
+    def seek(self, tick):
+        self.tick = min(max(tick, self.start), self.end)
+        self._last_time = None
+
+    def pause(self):
+        self._last_time = None
+
+    def advance(self, now=None):
+        # a slow frame moves the clock further, which skips the frames that
+        # would not fit in the wall-clock budget
+        now = time.perf_counter() if now is None else now
+        if self._last_time is not None:
+            self.tick += (now - self._last_time) * self.rate
+            if self.tick > self.end:
+                span = self.end - self.start
+                if self.loop and span > 0:
+                    self.tick = self.start + (self.tick - self.end) % span
+                else:
+                    self.tick = self.end
+        self._last_time = now
+        return self.tick
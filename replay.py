@@ -0,0 +1,89 @@
+from event_index import EventIndex
+from ingest import (
+    BuildingEventIngest,
+    BuildingIngest,
+    CombatLogEventIngest,
+    CombatLogIngest,
+    CreepIngest,
+    HeroIngest,
+    ItemIngest,
+    ingest_file,
+)
+
+# one match, parsed once: every script reads its section from here instead of
+# walking the raw log again
+#   heroes, creeps   TrackStore
+#   hero_info        {hero_name: static "-1" record}
+#   buildings        BuildingStore
+#   items            ItemStore
+#   combat_log       CombatLog
+#   events           EventIndex
+
+
+class Replay:
+    def __init__(
+        self,
+        heroes,
+        hero_info,
+        creeps,
+        buildings,
+        items,
+        events,
+        combat_log=None,
+        load_combat_log=None,
+    ):
+        self.heroes = heroes
+        self.hero_info = hero_info
+        self.creeps = creeps
+        self.buildings = buildings
+        self.items = items
+        self.events = events
+        # the combat log is the largest section and few scripts need it, so a
+        # cached replay reads it on first use
+        self._combat_log = combat_log
+        self._load_combat_log = load_combat_log
+
+    @property
+    def combat_log(self):
+        if self._combat_log is None and self._load_combat_log is not None:
+            self._combat_log = self._load_combat_log()
+        return self._combat_log
+
+    def hero_info_records(self):
+        # the static "-1" block as (tick, hero_name, record) events
+        for hero_name, hero_data in self.hero_info.items():
+            yield -1, hero_name, hero_data
+
+
+def ingest_replay(log_path, on_read=None, on_section=None):
+    # every section in a single pass over the log. on_section(name, value)
+    # hands out heroes, creeps, buildings, items and combat_log as soon as
+    # each is built; see ingest_file for on_read
+    hero_ingest = HeroIngest()
+    events = EventIndex()
+    handlers = {
+        "heroes": hero_ingest,
+        "creeps": CreepIngest(),
+        "buildings": BuildingIngest(),
+        "items": ItemIngest(),
+        "combat_log": CombatLogIngest(),
+    }
+    names = {id(handler): name for name, handler in handlers.items()}
+
+    def on_built(handler, result):
+        if on_section is not None and id(handler) in names:
+            on_section(names[id(handler)], result)
+
+    heroes, creeps, buildings, items, combat_log, _, _ = ingest_file(
+        log_path,
+        [
+            *handlers.values(),
+            CombatLogEventIngest(events),
+            BuildingEventIngest(events),
+        ],
+        on_read,
+        on_built,
+    )
+    return Replay(
+        heroes, hero_ingest.info, creeps, buildings, items, events, combat_log
+    )
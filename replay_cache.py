@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import instrument
+from building_store import BuildingStore
+from combat_log import CombatLog
+from event_index import EventIndex
+from item_store import ItemStore
+from replay import Replay, ingest_replay
+from staging import install, make_staging, write_atomic
+from track_store import TrackStore
+
+# binary cache of a combined log, stored next to it as <log>.cache/:
+# .npy column files (memory-mapped on load) plus JSON sidecars for strings
+CACHE_VERSION = 6
+CACHE_SUFFIX = ".cache"
+
+
+def cache_dir(log_path):
+    return os.fspath(log_path) + CACHE_SUFFIX
+
+
+def _file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def _write_json(path, value):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(value, file)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _save_tracks(directory, name, store, **sidecar):
+    np.save(os.path.join(directory, f"{name}.npy"), store.data)
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), store.offsets)
+    np.save(os.path.join(directory, f"{name}_deaths.npy"), store.deaths)
+    _write_json(
+        os.path.join(directory, f"{name}.json"),
+        {"names": store.names, "stats": store.stats(), **sidecar},
+    )
+
+
+def _load_tracks(directory, name, mmap_mode):
+    sidecar = _read_json(os.path.join(directory, f"{name}.json"))
+    store = TrackStore(
+        sidecar.pop("names"),
+        np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode),
+        np.load(os.path.join(directory, f"{name}_offsets.npy")),
+        np.load(os.path.join(directory, f"{name}_deaths.npy")),
+        sidecar.pop("stats"),
+    )
+    return store, sidecar
+
+
+def _save_buildings(directory, buildings):
+    np.save(os.path.join(directory, "buildings.npy"), buildings.data)
+    _write_json(
+        os.path.join(directory, "buildings.json"),
+        {"ids": buildings.ids, "types": buildings.types},
+    )
+
+
+def _load_buildings(directory, mmap_mode):
+    sidecar = _read_json(os.path.join(directory, "buildings.json"))
+    return BuildingStore(
+        sidecar["ids"],
+        np.load(os.path.join(directory, "buildings.npy"), mmap_mode=mmap_mode),
+        sidecar["types"],
+    )
+
+
+def _save_items(directory, items):
+    np.save(os.path.join(directory, "items.npy"), items.events)
+    np.save(os.path.join(directory, "items_owners.npy"), items.owners)
+    np.save(os.path.join(directory, "items_offsets.npy"), items.offsets)
+    _write_json(
+        os.path.join(directory, "items.json"),
+        {"ids": items.ids, "names": items.names},
+    )
+
+
+def _load_items(directory, mmap_mode):
+    sidecar = _read_json(os.path.join(directory, "items.json"))
+    events = np.load(os.path.join(directory, "items.npy"), mmap_mode=mmap_mode)
+    return ItemStore(
+        sidecar["ids"],
+        sidecar["names"],
+        events,
+        np.load(os.path.join(directory, "items_owners.npy")),
+        np.load(os.path.join(directory, "items_offsets.npy")),
+    )
+
+
+def _save_combat_log(directory, combat_log):
+    np.save(os.path.join(directory, "combatlog_ticks.npy"), combat_log.ticks)
+    np.save(os.path.join(directory, "combatlog_types.npy"), combat_log.types)
+    _write_json(
+        os.path.join(directory, "combatlog.json"),
+        {"type_names": combat_log.type_names, "events": combat_log.events},
+    )
+
+
+def _load_combat_log(directory):
+    sidecar = _read_json(os.path.join(directory, "combatlog.json"))
+    return CombatLog(
+        np.load(os.path.join(directory, "combatlog_ticks.npy")),
+        np.load(os.path.join(directory, "combatlog_types.npy")),
+        sidecar["type_names"],
+        sidecar["events"],
+    )
+
+
+@instrument.traced("build_cache")
+def build_cache(log_path):
+    replay = ingest_replay(log_path)
+    write_cache(log_path, replay)
+    return replay
+
+
+def write_cache(log_path, replay):
+    # caches a replay already ingested from log_path
+    stat = os.stat(log_path)
+    directory = cache_dir(log_path)
+    staging = make_staging(directory)
+
+    _save_tracks(staging, "heroes", replay.heroes, info=replay.hero_info)
+    _save_tracks(staging, "creeps", replay.creeps)
+    _save_buildings(staging, replay.buildings)
+    _save_items(staging, replay.items)
+    _save_combat_log(staging, replay.combat_log)
+    _write_json(os.path.join(staging, "events.json"), replay.events.to_json())
+    _write_json(
+        os.path.join(staging, "manifest.json"),
+        {
+            "version": CACHE_VERSION,
+            "source": os.path.basename(log_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _file_hash(log_path),
+        },
+    )
+
+    install(staging, directory, lambda: is_cache_valid(log_path))
+
+
+def is_cache_valid(log_path):
+    manifest_path = os.path.join(cache_dir(log_path), "manifest.json")
+    try:
+        manifest = _read_json(manifest_path)
+        stat = os.stat(log_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+    if manifest.get("version") != CACHE_VERSION or manifest["size"] != stat.st_size:
+        return False
+    if manifest["mtime_ns"] == stat.st_mtime_ns:
+        return True
+
+    # touched but maybe not changed: fall back to the content hash
+    if manifest["sha256"] != _file_hash(log_path):
+        return False
+    manifest["mtime_ns"] = stat.st_mtime_ns
+    write_atomic(manifest_path, json.dumps(manifest))
+    return True
+
+
+@instrument.traced("load_cache")
+def load_cache(log_path, mmap_mode="r"):
+    if not is_cache_valid(log_path):
+        return None
+
+    directory = cache_dir(log_path)
+    heroes, sidecar = _load_tracks(directory, "heroes", mmap_mode)
+    creeps, _ = _load_tracks(directory, "creeps", mmap_mode)
+    return Replay(
+        heroes,
+        sidecar["info"],
+        creeps,
+        _load_buildings(directory, mmap_mode),
+        _load_items(directory, mmap_mode),
+        EventIndex.from_json(_read_json(os.path.join(directory, "events.json"))),
+        load_combat_log=lambda: _load_combat_log(directory),
+    )
+
+
+def open_replay(log_path, mmap_mode="r"):
+    # memory-mapped cache if it is fresh, otherwise parse once and write it
+    cache = load_cache(log_path, mmap_mode)
+    if cache is None:
+        build_cache(log_path)
+        cache = load_cache(log_path, mmap_mode)
+    return cache
@@ -0,0 +1,199 @@
+import json
+import os
+
+# incremental reader for *_combined_log.json files: walks the nested objects
+# and decodes one leaf at a time instead of json.load-ing the whole document
+CHUNK_SIZE = 1 << 20
+SECTIONS = ("heroes", "creeps", "buildings", "items", "combatLog")
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+
+
+class _Reader:
+    def __init__(self, file, chunk_size=CHUNK_SIZE, on_read=None):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.on_read = on_read  # called with the length of every chunk read
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        # read at least as much as is buffered so values larger than a
+        # chunk are decoded in amortized linear time
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        if self.on_read is not None:
+            self.on_read(len(chunk))
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end < len(self.buffer) or not self._fill():
+                self.pos = end
+                return value
+
+    def members(self):
+        # yields the keys of an object; the caller must consume each value
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise json.JSONDecodeError(
+                    "Expecting ',' delimiter", self.buffer, self.pos - 1
+                )
+
+    def skip(self):
+        if self.peek() == "{":
+            for _ in self.members():
+                self.value()
+        else:
+            self.value()
+
+
+def _walk(reader, path, depth):
+    if len(path) == depth or reader.peek() != "{":
+        yield path, reader.value()
+        return
+    empty = True
+    for key in reader.members():
+        empty = False
+        yield from _walk(reader, path + (key,), depth)
+    if empty:
+        yield path, {}
+
+
+def iter_items(file_path, depth=3, keys=None, exclude=(), on_read=None):
+    # yields (path, value) pairs for every value `depth` objects deep; values
+    # that are not objects (or empty objects) above that depth come with a
+    # shorter path. keys restricts the top-level sections that are walked,
+    # exclude skips sections. on_read(n) reports every n characters read.
+    remaining = set(keys) if keys is not None else None
+    with open(file_path, "r", encoding="utf-8") as file:
+        reader = _Reader(file, on_read=on_read)
+        for key in reader.members():
+            if key in exclude:
+                reader.skip()
+                continue
+            if remaining is None:
+                yield from _walk(reader, (key,), depth)
+                continue
+            if key not in remaining:
+                reader.skip()
+                continue
+            yield from _walk(reader, (key,), depth)
+            remaining.discard(key)
+            if not remaining:
+                return
+
+
+def is_ndjson(file_path):
+    return os.fspath(file_path).endswith(NDJSON_SUFFIXES)
+
+
+def ndjson_sections(lines, sections=SECTIONS):
+    # per-tick NDJSON: one {"tick": t, "<section>": {entity_id: record}} object
+    # per line, e.g. {"tick": -1, "heroes": {...}} for the static hero block
+    for line in lines:
+        if not line.strip():
+            continue
+        tick_data = json.loads(line)
+        tick = int(tick_data["tick"])
+        for section in sections:
+            for entity_id, record in tick_data.get(section, {}).items():
+                yield section, tick, entity_id, record
+
+
+def _counted(lines, on_read):
+    for line in lines:
+        on_read(len(line))
+        yield line
+
+
+def iter_sections(file_path, sections=SECTIONS, on_read=None):
+    # yields (section, tick, entity_id, record) events in file order
+    if is_ndjson(file_path):
+        with open(file_path, "r", encoding="utf-8") as file:
+            lines = file if on_read is None else _counted(file, on_read)
+            yield from ndjson_sections(lines, sections)
+        return
+    for path, record in iter_items(
+        file_path, depth=3, keys=sections, on_read=on_read
+    ):
+        if len(path) == 3:
+            section, tick, entity_id = path
+            yield section, int(tick), entity_id, record
+
+
+def iter_records(file_path, section):
+    for _, tick, entity_id, record in iter_sections(file_path, (section,)):
+        yield tick, entity_id, record
+
+
+class LogTail:
+    # follows a growing NDJSON log: every poll() yields the events of the
+    # lines completed since the previous one, reading only the new bytes
+    def __init__(self, file_path, sections=SECTIONS):
+        self.file_path = file_path
+        self.sections = sections
+        self.offset = 0
+        self._partial = b""
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return
+        if size < self.offset:
+            # the log was rewritten from scratch
+            self.offset, self._partial = 0, b""
+        if size == self.offset:
+            return
+        with open(self.file_path, "rb") as file:
+            file.seek(self.offset)
+            data = self._partial + file.read(size - self.offset)
+        self.offset = size
+        # a line without its newline is still being written
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        lines = data[:end].decode("utf-8").splitlines()
+        yield from ndjson_sections(lines, self.sections)
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+# cache directories are written into a private staging directory next to
+# them and renamed into place whole, so a reader never sees half a cache.
+# Several processes may build the same cache at once (export workers, compare,
+# batch runs); each stages its own copy and whoever renames first wins.
+
+
+def make_staging(directory):
+    parent, name = os.path.split(os.path.abspath(directory))
+    return tempfile.mkdtemp(prefix=f"{name}.", suffix=".tmp", dir=parent)
+
+
+def install(staging, directory, is_current):
+    # moves staging to directory. is_current() tells whether what is already
+    # at directory is up to date; then it is kept and staging is dropped, as
+    # another writer finished the same cache first. A stale directory is
+    # moved aside (never deleted in place) before trying again.
+    try:
+        while True:
+            try:
+                os.rename(staging, directory)
+                return
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+            if is_current():
+                return
+            trash = make_staging(directory)
+            try:
+                os.rename(directory, os.path.join(trash, "old"))
+            except FileNotFoundError:
+                pass  # someone else moved it already
+            finally:
+                shutil.rmtree(trash, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def write_atomic(path, text):
+    # path is replaced in one step, so readers see the old or the new text
+    fd, temp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
@@ -0,0 +1,234 @@
+import argparse
+import json
+import random
+
+# synthetic *_combined_log.json files for benchmarks: ten heroes walking the
+# map, creep waves running down three lanes, buildings with the fort falling
+# at the end, item purchases and sales, and a combat log shifted by a fixed
+# offset for timestamp_fix. Every section is written tick by tick, so logs
+# of any length are generated in constant memory.
+MAP_MIN, MAP_MAX = -7000.0, 7000.0
+# lane waypoints from the radiant (team 2) base to the dire (team 3) base
+LANES = (
+    ((-6200.0, -5800.0), (-6200.0, 5900.0), (5800.0, 6000.0)),
+    ((-5800.0, -5800.0), (0.0, 0.0), (5800.0, 5600.0)),
+    ((-5600.0, -6300.0), (6100.0, -6300.0), (6100.0, 5800.0)),
+)
+ITEM_NAMES = (
+    "CDOTA_Item_Tango",
+    "CDOTA_Item_Flask",
+    "CDOTA_Item_Boots",
+    "CDOTA_Item_Blink",
+    "CDOTA_Item_BlackKingBar",
+    "CDOTA_Item_Magic_Wand",
+    "CDOTA_Item_Power_Treads",
+    "CDOTA_Item_Ultimate_Scepter",
+)
+WAVE_INTERVAL = 30  # samples between creep waves
+CREEP_LIFETIME = 90  # samples a creep lives if nothing kills it first
+COMBATLOG_OFFSET = 45  # combat log ticks run this far behind the entities
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _lane_position(lane, progress):
+    # progress 0..1 along a lane's two segments
+    start, middle, end = LANES[lane]
+    if progress < 0.5:
+        a, b, t = start, middle, progress * 2
+    else:
+        a, b, t = middle, end, progress * 2 - 1
+    return a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t
+
+
+def _position(x, y):
+    return {"x": round(x, 3), "y": round(y, 3)}
+
+
+class SyntheticMatch:
+    def __init__(
+        self, samples=3600, creeps=120, item_churn=0.5, tick_step=30, seed=0
+    ):
+        # samples: number of position samples (match length); creeps: creeps
+        # alive at once; item_churn: item events per sample
+        self.samples = samples
+        self.creeps = creeps
+        self.item_churn = item_churn
+        self.tick_step = tick_step
+        self.seed = seed
+        self.heroes = [f"CDOTA_Unit_Hero_Synthetic{i}" for i in range(10)]
+        self.end_tick = (samples - 1) * tick_step
+
+    def _random(self, section):
+        return random.Random(f"{self.seed}:{section}")
+
+    def ticks(self):
+        return range(0, self.samples * self.tick_step, self.tick_step)
+
+    def hero_ticks(self):
+        rng = self._random("heroes")
+        yield -1, {
+            hero: {"teamNum": 2 if i < 5 else 3, "playerID": i}
+            for i, hero in enumerate(self.heroes)
+        }
+        positions = [
+            [rng.uniform(MAP_MIN, MAP_MAX), rng.uniform(MAP_MIN, MAP_MAX)]
+            for _ in self.heroes
+        ]
+        for tick in self.ticks():
+            tick_data = {}
+            for hero, position in zip(self.heroes, positions):
+                if rng.random() < 0.05:
+                    tick_data[hero] = {}  # no position this tick
+                    continue
+                for axis in (0, 1):
+                    position[axis] = min(
+                        max(position[axis] + rng.gauss(0, 250), MAP_MIN), MAP_MAX
+                    )
+                tick_data[hero] = {"position": _position(*position)}
+            yield tick, tick_data
+
+    def creep_ticks(self):
+        rng = self._random("creeps")
+        per_wave = max(self.creeps * WAVE_INTERVAL // CREEP_LIFETIME, 2)
+        alive = {}  # creep id -> (team, lane, spawn sample)
+        next_id = 10000
+        for sample, tick in enumerate(self.ticks()):
+            tick_data = {}
+            if sample % WAVE_INTERVAL == 0:
+                for i in range(per_wave):
+                    alive[str(next_id)] = (2 + i % 2, (i // 2) % 3, sample)
+                    next_id += 1
+            for creep_id, (team, lane, spawned) in list(alive.items()):
+                age = sample - spawned
+                if age >= CREEP_LIFETIME or rng.random() < 0.01:
+                    tick_data[creep_id] = {"deleted": True}
+                    del alive[creep_id]
+                    continue
+                progress = age / CREEP_LIFETIME
+                if team == 3:
+                    progress = 1 - progress
+                x, y = _lane_position(lane, progress)
+                tick_data[creep_id] = {
+                    "position": _position(x + rng.gauss(0, 80), y + rng.gauss(0, 80)),
+                    "teamNum": team,
+                }
+            yield tick, tick_data
+
+    def building_ticks(self):
+        buildings = {"1": ("CDOTA_BaseNPC_Fort", 2, (-6600.0, -6100.0))}
+        buildings["2"] = ("CDOTA_BaseNPC_Fort", 3, (6000.0, 5500.0))
+        for lane in range(3):
+            for team, progress in ((2, 0.25), (3, 0.75)):
+                building_id = str(10 + lane * 2 + team - 2)
+                position = _lane_position(lane, progress)
+                buildings[building_id] = ("CDOTA_BaseNPC_Tower", team, position)
+
+        # the dire fort and one tower per lane fall during the match
+        destroyed = {"2": self.end_tick}
+        for lane in range(3):
+            sample = (lane + 1) * (self.samples - 1) // 4
+            destroyed[str(11 + lane * 2)] = sample * self.tick_step
+        for tick in self.ticks():
+            tick_data = {}
+            for building_id, (building_type, team, (x, y)) in buildings.items():
+                end = destroyed.get(building_id)
+                if end is not None and tick > end:
+                    continue
+                if tick == end:
+                    tick_data[building_id] = {"deleted": True}
+                    continue
+                tick_data[building_id] = {
+                    "position": _position(x, y),
+                    "teamNum": team,
+                    "buildingType": building_type,
+                }
+            yield tick, tick_data
+
+    def item_ticks(self):
+        rng = self._random("items")
+        owned = []  # (item id, owner, name)
+        next_id = 500000
+        for tick in self.ticks():
+            tick_data = {}
+            events = int(self.item_churn) + (rng.random() < self.item_churn % 1)
+            for _ in range(events):
+                if owned and rng.random() < 0.4:
+                    item_id, owner, name = owned.pop(rng.randrange(len(owned)))
+                    tick_data[item_id] = {
+                        "name": name,
+                        "playerOwnerID": owner,
+                        "deleted": True,
+                    }
+                    continue
+                item_id, owner = str(next_id), rng.randrange(len(self.heroes))
+                name = f"{rng.choice(ITEM_NAMES)}({owner})"
+                next_id += 1
+                owned.append((item_id, owner, name))
+                tick_data[item_id] = {"name": name, "playerOwnerID": owner}
+            if tick_data:
+                yield tick, tick_data
+
+    def combatlog_ticks(self):
+        rng = self._random("combatLog")
+        for tick in self.ticks():
+            combat_tick = tick - COMBATLOG_OFFSET
+            damage = [
+                {
+                    "attacker": rng.choice(self.heroes),
+                    "target": rng.choice(self.heroes),
+                    "value": rng.randrange(20, 400),
+                }
+                for _ in range(rng.randrange(1, 6))
+            ]
+            tick_data = {"DOTA_COMBATLOG_DAMAGE": damage}
+            if tick == self.end_tick:
+                tick_data["DOTA_COMBATLOG_DEATH"] = [
+                    {"attacker": self.heroes[0], "target": "npc_dota_badguys_fort"}
+                ]
+            yield combat_tick, tick_data
+
+    def sections(self):
+        return {
+            "heroes": self.hero_ticks(),
+            "creeps": self.creep_ticks(),
+            "buildings": self.building_ticks(),
+            "items": self.item_ticks(),
+            "combatLog": self.combatlog_ticks(),
+        }
+
+    def write(self, output_file):
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write("{")
+            for i, (section, ticks) in enumerate(self.sections().items()):
+                f.write(("," if i else "") + _dumps(section) + ":{")
+                for j, (tick, tick_data) in enumerate(ticks):
+                    f.write(("," if j else "") + f'"{tick}":' + _dumps(tick_data))
+                f.write("}")
+            f.write("}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic combined log")
+    parser.add_argument("output", help="e.g. synthetic_combined_log.json")
+    parser.add_argument("--samples", type=int, default=3600, help="match length")
+    parser.add_argument(
+        "--creeps", type=int, default=120, help="creeps alive at once"
+    )
+    parser.add_argument(
+        "--item-churn", type=float, default=0.5, help="item events per sample"
+    )
+    parser.add_argument("--tick-step", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    SyntheticMatch(
+        args.samples, args.creeps, args.item_churn, args.tick_step, args.seed
+    ).write(args.output)
+    print(f"Synthetic log written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
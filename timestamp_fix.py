@@ -1,65 +1,56 @@
-import json
+from itertools import chain
 
+import instrument
+import output_writers
+from replay_cache import open_replay
+from replay_stream import iter_items
 
-def load_data(file_path):
-    try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        print(f"File {file_path} not found!")
-        return None
-    except json.JSONDecodeError:
-        print(f"Failed to decode JSON from file {file_path}")
-        return None
 
+# .npz layout of the updated log: one row per (section, tick) with the
+# tick's records as JSON
+LOG_COLUMNS = [("section", "str"), ("tick", "int"), ("records", "json")]
 
-def get_combatlog_end(data):
-    forts = ["npc_dota_goodguys_fort", "npc_dota_badguys_fort"]
-    combatlog = data.get("combatLog", {})
 
-    for tick_str, events in combatlog.items():
-        combatlog_tick = int(tick_str)
-        death_events = events.get("DOTA_COMBATLOG_DEATH", [])
+def _log_line(path, value):
+    # per-tick NDJSON, as replay_stream reads it back
+    if len(path) == 1:
+        return {"tick": -1, path[0]: value} if value else None
+    return {"tick": int(path[1]), path[0]: value}
 
-        for event in death_events:
-            target = event.get("target")
-            if target in forts:
-                return combatlog_tick
 
-    return None
-
-
-def get_buildings_end(data):
-    buildings = data.get("buildings", {})
-    fort_entity_ids = set()
+def _log_rows(path, value):
+    if len(path) == 1:
+        if value:
+            yield path[0], -1, value
+        return
+    yield path[0], int(path[1]), value
 
-    for tick_str, tick_data in buildings.items():
-        for entity_id_str, entity_data in tick_data.items():
-            building_type = entity_data.get("buildingType", "")
-            if building_type.startswith("CDOTA_BaseNPC_Fort"):
-                fort_entity_ids.add(int(entity_id_str))
 
-    destruction_tick = {}
+def _combat_log_items(combat_log):
+    if not len(combat_log):
+        yield ("combatLog",), {}
+    for tick_str, events in combat_log.tick_items():
+        yield ("combatLog", tick_str), events
 
-    for tick_str, tick_data in buildings.items():
-        tick = int(tick_str)
-        for entity_id_str, entity_data in tick_data.items():
-            entity_id = int(entity_id_str)
-            if entity_id in fort_entity_ids:
-                if isinstance(entity_data, dict) and entity_data.get("deleted") is True:
-                    destruction_tick[entity_id] = tick
 
-    return destruction_tick
+def combatlog_offset(combatlog_end_tick, buildings_end_tick):
+    # entity ticks minus combat log ticks, from the fort death seen in both;
+    # None when either end is missing
+    if not buildings_end_tick or combatlog_end_tick is None:
+        return None
+    return min(buildings_end_tick.values()) - combatlog_end_tick
 
 
-def offset_combatlog(data, combatlog_end_tick, buildings_end_tick, output_file):
-    if buildings_end_tick is None or combatlog_end_tick is None:
+@instrument.traced("offset_combatlog")
+def offset_combatlog(
+    file_path, combat_log, combatlog_end_tick, buildings_end_tick, output_file
+):
+    offset = combatlog_offset(combatlog_end_tick, buildings_end_tick)
+    if offset is None:
         print("No end ticks found, cannot offset combat log.")
         return
 
     building_end_tick = min(buildings_end_tick.values())
-
-    offset = building_end_tick - combatlog_end_tick
     print(
         f"Offset to apply: {offset} (building_end: {building_end_tick} - combatlog_end: {combatlog_end_tick})"
     )
@@ -68,20 +59,28 @@ def offset_combatlog(data, combatlog_end_tick, buildings_end_tick, output_file):
         print("No offset needed.")
         return
 
-    combatlog = data.get("combatLog", {})
-    new_combatlog = {}
-
-    for tick_str, events in combatlog.items():
-        original_tick = int(tick_str)
-        new_tick = original_tick + offset
-        new_combatlog[str(new_tick)] = events
-
-    new_data = data.copy()
-    new_data["combatLog"] = new_combatlog
+    # the shift is only recorded here; it is added to the whole tick column
+    # at once when the combat log is read back out
+    combat_log.offset = offset
 
     try:
-        with open(output_file, "w", encoding="utf-8") as outfile:
-            json.dump(new_data, outfile, indent=1)
+        # streamed section by section; the extension of output_file picks
+        # the format (.json, .ndjson, .npz, optionally .gz/.bz2/.xz). The
+        # other sections are copied as they are, so this re-reads the log
+        # (the Replay keeps no raw records); only the combat log comes
+        # from the Replay
+        with instrument.span("serialize", file=output_file):
+            output_writers.write_entries(
+                output_file,
+                chain(
+                    iter_items(file_path, depth=2, exclude=("combatLog",)),
+                    _combat_log_items(combat_log),
+                ),
+                line=_log_line,
+                columns=LOG_COLUMNS,
+                rows=_log_rows,
+                compress=True,
+            )
         print(f"Offset combatLog saved to {output_file}")
     except Exception as e:
         print(f"Failed to save new JSON: {str(e)}")
@@ -93,21 +92,26 @@ def main():
         file_name = "_combined_log.json"
         new_file = "_updated_log.json"
 
-        data = load_data(str(game_id) + str(file_name))
+        data_path = str(game_id) + str(file_name)
         new_data_path = str(game_id) + str(new_file)
 
-        if data is None:
-            print("Failed to load data file.")
-            return
-
-        combat_log_end_tick = get_combatlog_end(data)
-        buildings_end_tick = get_buildings_end(data)
+        # the event index is built with the replay cache, so both end
+        # markers are direct lookups
+        replay = open_replay(data_path)
+        combat_log_end_tick = replay.events.combatlog_end()
+        buildings_end_tick = replay.events.buildings_end()
 
         if combat_log_end_tick is None or buildings_end_tick is None:
             print("Error: Could not find end ticks.")
             return
 
-        offset_combatlog(data, combat_log_end_tick, buildings_end_tick, new_data_path)
+        offset_combatlog(
+            data_path,
+            replay.combat_log,
+            combat_log_end_tick,
+            buildings_end_tick,
+            new_data_path,
+        )
 
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -0,0 +1,155 @@
+import argparse
+
+import numpy as np
+from matplotlib.path import Path
+
+from replay_cache import open_replay
+from track_store import ranges
+
+# spatio-temporal index over a TrackStore: samples are bucketed by tick window
+# and by CELL_SIZE grid cell, and every bucket is one contiguous run of sample
+# row numbers. A query only reads the buckets its box and tick range touch,
+# then filters those samples exactly. Only the row numbers are kept; the rows
+# themselves are read from the (memory-mapped) store.
+CELL_SIZE = 1000.0  # world units
+INDEX_WINDOW_SAMPLES = 60  # samples per tick window
+
+
+class TrackIndex:
+    def __init__(self, store, cell_size=CELL_SIZE, window_ticks=None):
+        self.store = store
+        data = store.data
+        if window_ticks is None:
+            window_ticks = store.sample_interval() * INDEX_WINDOW_SAMPLES
+        self.window_ticks = max(float(window_ticks), 1.0)
+        self.cell_size = float(cell_size)
+        tick_min, tick_max = store.tick_range() or (0, 0)
+        x_min, x_max, y_min, y_max = store.bounds() or (0.0, 0.0, 0.0, 0.0)
+        self.origin = (tick_min, x_min, y_min)
+        self.windows = int((tick_max - tick_min) // self.window_ticks) + 1
+        self.columns = int((x_max - x_min) // self.cell_size) + 1
+        self.rows = int((y_max - y_min) // self.cell_size) + 1
+
+        keys = self._keys(
+            self._window(data["tick"]),
+            self._cell_x(data["x"]),
+            self._cell_y(data["y"]),
+        )
+        self.order = np.argsort(keys, kind="stable").astype(
+            np.int32 if len(keys) < 2**31 else np.int64
+        )
+        counts = np.bincount(keys, minlength=self.windows * self.rows * self.columns)
+        self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    def _window(self, ticks):
+        index = np.floor((np.asarray(ticks) - self.origin[0]) / self.window_ticks)
+        return np.clip(index, 0, self.windows - 1).astype(np.int64)
+
+    def _cell_x(self, x):
+        index = np.floor((np.asarray(x) - self.origin[1]) / self.cell_size)
+        return np.clip(index, 0, self.columns - 1).astype(np.int64)
+
+    def _cell_y(self, y):
+        index = np.floor((np.asarray(y) - self.origin[2]) / self.cell_size)
+        return np.clip(index, 0, self.rows - 1).astype(np.int64)
+
+    def _keys(self, windows, cell_x, cell_y):
+        return (windows * self.rows + cell_y) * self.columns + cell_x
+
+    def _candidates(self, x0, x1, y0, y1, tick_start, tick_end):
+        # store rows of the buckets overlapping the box and ticks, in store
+        # order so the reads walk the file forwards
+        windows = np.arange(self._window(tick_start), self._window(tick_end) + 1)
+        cell_x = np.arange(self._cell_x(x0), self._cell_x(x1) + 1)
+        cell_y = np.arange(self._cell_y(y0), self._cell_y(y1) + 1)
+        keys = self._keys(
+            windows[:, None, None], cell_x[None, None, :], cell_y[None, :, None]
+        ).ravel()
+        positions = ranges(self.offsets[keys], self.offsets[keys + 1])
+        return np.sort(self.order[positions])
+
+    def box(self, x0, x1, y0, y1, tick_start, tick_end):
+        # samples inside [x0, x1] x [y0, y1] with tick_start <= tick <= tick_end
+        candidates = self._candidates(x0, x1, y0, y1, tick_start, tick_end)
+        rows = np.asarray(self.store.data[candidates])
+        x, y, ticks = rows["x"], rows["y"], rows["tick"]
+        return rows[
+            (x >= x0)
+            & (x <= x1)
+            & (y >= y0)
+            & (y <= y1)
+            & (ticks >= tick_start)
+            & (ticks <= tick_end)
+        ]
+
+    def radius(self, x, y, distance, tick_start, tick_end):
+        rows = self.box(
+            x - distance, x + distance, y - distance, y + distance, tick_start, tick_end
+        )
+        near = (rows["x"] - x) ** 2 + (rows["y"] - y) ** 2 <= distance**2
+        return rows[near]
+
+    def polygon(self, vertices, tick_start, tick_end):
+        # vertices: [(x, y), ...] of a closed polygon such as a lane outline
+        vertices = np.asarray(vertices, dtype=np.float64)
+        (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+        rows = self.box(x0, x1, y0, y1, tick_start, tick_end)
+        points = np.column_stack((rows["x"], rows["y"]))
+        return rows[Path(vertices).contains_points(points)]
+
+    def nearest(self, x, y, tick, k=1, max_distance=None):
+        # the k entities closest to (x, y) at tick, each at its latest sample
+        # no more than one sample interval before tick; returns (rows,
+        # distances), nearest first. That slice of time lies in one or two
+        # tick windows, so it is read in one go rather than ring by ring.
+        tick_start = tick - self.store.sample_interval()
+        if max_distance is None:
+            rows = self.box(-np.inf, np.inf, -np.inf, np.inf, tick_start, tick)
+        else:
+            rows = self.radius(x, y, max_distance, tick_start, tick)
+        # latest sample per living entity
+        rows = rows[np.lexsort((-rows["tick"], rows["entity"]))]
+        rows = rows[np.diff(rows["entity"], prepend=-1) != 0]
+        rows = rows[self.store.deaths[rows["entity"]] > tick]
+
+        distances = np.hypot(rows["x"] - x, rows["y"] - y)
+        order = np.argsort(distances, kind="stable")[:k]
+        return rows[order], distances[order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Who was where, and when")
+    parser.add_argument("log", help="*_combined_log.json file")
+    parser.add_argument("--creeps", action="store_true", help="query creeps")
+    parser.add_argument("--ticks", nargs=2, type=float, default=None)
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--radius", nargs=3, type=float, metavar=("X", "Y", "R"))
+    query.add_argument(
+        "--box", nargs=4, type=float, metavar=("X0", "X1", "Y0", "Y1")
+    )
+    query.add_argument("--polygon", nargs="+", type=float, metavar="X Y")
+    args = parser.parse_args()
+
+    replay = open_replay(args.log)
+    store = replay.creeps if args.creeps else replay.heroes
+    tick_start, tick_end = args.ticks or store.tick_range() or (0, 0)
+    index = TrackIndex(store)
+
+    if args.radius:
+        rows = index.radius(*args.radius, tick_start, tick_end)
+    elif args.box:
+        rows = index.box(*args.box, tick_start, tick_end)
+    else:
+        if len(args.polygon) % 2:
+            parser.error("--polygon needs x y pairs")
+        rows = index.polygon(np.reshape(args.polygon, (-1, 2)), tick_start, tick_end)
+
+    for entity in np.unique(rows["entity"]).tolist():
+        ticks = rows["tick"][rows["entity"] == entity]
+        print(f"{store.names[entity]}: ticks {ticks.min()}-{ticks.max()}")
+    print(f"{len(rows)} samples of {len(np.unique(rows['entity']))} entities")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+from array import array
+
+import numpy as np
+
+# columnar storage for entity tracks, one row per (entity, tick) sample
+TRACK_DTYPE = np.dtype(
+    [
+        ("tick", np.int32),
+        ("entity", np.int32),
+        ("x", np.float32),
+        ("y", np.float32),
+        ("team", np.int8),
+    ]
+)
+
+
+NO_TICK = np.iinfo(np.int32).max
+
+
+class TrackStore:
+    def __init__(self, names, data, offsets, deaths=None, stats=None):
+        # data is sorted by (entity, tick); rows of entity i live in
+        # data[offsets[i]:offsets[i + 1]]. stats holds precomputed
+        # tick_range/sample_interval/bounds so a memory-mapped store can
+        # answer them without scanning every sample
+        self.names = list(names)
+        self.data = data
+        self.offsets = offsets
+        if deaths is None:
+            deaths = np.full(len(self.names), NO_TICK, dtype=np.int32)
+        self.deaths = deaths
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._spawns = None
+        self._keys = None
+        self._stats = dict(stats or {})
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def index(self, name):
+        return self._index[name]
+
+    def track(self, entity):
+        if not isinstance(entity, (int, np.integer)):
+            entity = self._index[entity]
+        return self.data[self.offsets[entity] : self.offsets[entity + 1]]
+
+    def sample_counts(self):
+        return np.diff(self.offsets)
+
+    def teams(self):
+        # team of the last sample of every entity
+        teams = np.zeros(len(self.names), dtype=np.int8)
+        counts = self.sample_counts()
+        has_samples = counts > 0
+        teams[has_samples] = self.data["team"][self.offsets[1:][has_samples] - 1]
+        return teams
+
+    def spawns(self):
+        if self._spawns is None:
+            spawns = np.full(len(self.names), NO_TICK, dtype=np.int32)
+            has_samples = self.sample_counts() > 0
+            spawns[has_samples] = self.data["tick"][self.offsets[:-1][has_samples]]
+            self._spawns = spawns
+        return self._spawns
+
+    def sample_rows(self, start, end):
+        # per entity, the rows [lo, hi) with ticks in [start, end] plus one
+        # sample on either side
+        first, last = self.offsets[:-1], self.offsets[1:]
+        lo = np.maximum(self._bisect(start, first, last) - 1, first)
+        hi = np.minimum(self._bisect(end, first, last) + 1, last)
+        return lo, np.maximum(hi, lo)
+
+    def _bisect(self, tick, first, last):
+        # bisect_right of tick in every track data[first[i]:last[i]] at once.
+        # Each step reads one tick per unfinished track, so a memory-mapped
+        # store only pages in the samples on the search paths.
+        ticks = self.data["tick"]
+        lo = np.array(first, dtype=np.int64)
+        hi = np.array(last, dtype=np.int64)
+        searching = np.flatnonzero(lo < hi)
+        while len(searching):
+            mid = (lo[searching] + hi[searching]) // 2
+            later = ticks[mid] > tick
+            hi[searching[later]] = mid[later]
+            lo[searching[~later]] = mid[~later] + 1
+            searching = searching[lo[searching] < hi[searching]]
+        return lo
+
+    def _sample_keys(self):
+        # (entity, tick) packed into one sorted int64 so a single
+        # searchsorted finds the latest sample of many entities at once
+        if self._keys is None:
+            self._keys = _pack_keys(self.data["entity"], self.data["tick"])
+        return self._keys
+
+    def alive_at(self, tick):
+        return np.flatnonzero((self.spawns() <= tick) & (self.deaths > tick))
+
+    def positions_at(self, tick, interpolate=False):
+        # latest sample at or before `tick` of every entity alive at `tick`;
+        # with interpolate=True, x and y are blended linearly towards the
+        # next sample, the same as np.interp on every track at once
+        entities = self.alive_at(tick)
+        lo = (
+            np.searchsorted(
+                self._sample_keys(),
+                _pack_keys(entities, np.full(len(entities), np.floor(tick))),
+                side="right",
+            )
+            - 1
+        )
+        rows = self.data[lo]
+        if not interpolate:
+            return rows
+
+        hi = np.minimum(lo + 1, self.offsets[entities + 1] - 1)
+        span = (self.data["tick"][hi] - rows["tick"]).astype(np.float32)
+        weight = np.clip(
+            (tick - rows["tick"]) / np.where(span > 0, span, 1), 0, 1
+        ).astype(np.float32)
+        rows["x"] += weight * (self.data["x"][hi] - rows["x"])
+        rows["y"] += weight * (self.data["y"][hi] - rows["y"])
+        return rows
+
+    def tick_range(self):
+        if "tick_range" not in self._stats:
+            ticks = self.data["tick"]
+            self._stats["tick_range"] = (
+                (int(ticks.min()), int(ticks.max())) if len(ticks) else None
+            )
+        return self._stats["tick_range"]
+
+    def sample_interval(self):
+        # typical tick step between consecutive samples of one entity
+        if "sample_interval" not in self._stats:
+            steps = np.diff(self.data["tick"])
+            steps = steps[(np.diff(self.data["entity"]) == 0) & (steps > 0)]
+            self._stats["sample_interval"] = (
+                float(np.median(steps)) if len(steps) else 1.0
+            )
+        return self._stats["sample_interval"]
+
+    def bounds(self):
+        if "bounds" not in self._stats:
+            x, y = self.data["x"], self.data["y"]
+            self._stats["bounds"] = (
+                (float(x.min()), float(x.max()), float(y.min()), float(y.max()))
+                if len(x)
+                else None
+            )
+        return self._stats["bounds"]
+
+    def stats(self):
+        return {
+            "tick_range": self.tick_range(),
+            "sample_interval": self.sample_interval(),
+            "bounds": self.bounds(),
+        }
+
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes + self.deaths.nbytes
+
+
+def _pack_keys(entities, ticks):
+    return (np.asarray(entities, dtype=np.int64) << 32) | (
+        np.asarray(ticks).astype(np.int64) + 2**31
+    )
+
+
+def ranges(starts, ends):
+    # concatenation of arange(start, end) for every pair, without a loop
+    lengths = np.asarray(ends, dtype=np.int64) - starts
+    run_starts = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum())) + np.repeat(starts - run_starts, lengths)
+
+
+class TrackBuilder:
+    def __init__(self):
+        self.names = []
+        self._index = {}
+        self._tick = array("i")
+        self._entity = array("i")
+        self._x = array("f")
+        self._y = array("f")
+        self._team = array("b")
+        self._deaths = {}
+
+    def entity_index(self, name):
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def add(self, tick, name, x, y, team=0):
+        self._tick.append(tick)
+        self._entity.append(self.entity_index(name))
+        self._x.append(x)
+        self._y.append(y)
+        self._team.append(team)
+
+    def mark_death(self, tick, name):
+        self._deaths[name] = tick
+
+    def build(self, teams=None):
+        data = np.empty(len(self._tick), dtype=TRACK_DTYPE)
+        data["tick"] = np.frombuffer(self._tick, dtype=np.int32)
+        data["entity"] = np.frombuffer(self._entity, dtype=np.int32)
+        data["x"] = np.frombuffer(self._x, dtype=np.float32)
+        data["y"] = np.frombuffer(self._y, dtype=np.float32)
+        data["team"] = np.frombuffer(self._team, dtype=np.int8)
+
+        if teams:
+            # per-entity teams (e.g. heroes' static "-1" block) override samples
+            entity_teams = np.array(
+                [teams.get(name, 0) for name in self.names], dtype=np.int8
+            )
+            if len(entity_teams):
+                data["team"] = entity_teams[data["entity"]]
+
+        data = data[np.lexsort((data["tick"], data["entity"]))]
+        offsets = np.searchsorted(data["entity"], np.arange(len(self.names) + 1))
+        deaths = np.array(
+            [self._deaths.get(name, NO_TICK) for name in self.names], dtype=np.int32
+        )
+        return TrackStore(self.names, data, offsets.astype(np.int64), deaths)
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from track_store import TrackStore, ranges
+
+# tick windows of a (memory-mapped) TrackStore, cut out on demand so scrubbing
+# only touches the samples around the playback position. Windows live in an
+# LRU of at most max_windows entries; the next one is cut in a background
+# thread while the current one is being played.
+WINDOW_SAMPLES = 600
+MAX_WINDOWS = 4
+
+
+class WindowedTracks:
+    def __init__(self, store, window_ticks=None, max_windows=MAX_WINDOWS):
+        self.store = store
+        if window_ticks is None:
+            window_ticks = store.sample_interval() * WINDOW_SAMPLES
+        self.window_ticks = max(float(window_ticks), 1.0)
+        self.max_windows = max(max_windows, 2)
+        self.origin = (store.tick_range() or (0, 0))[0]
+        self._windows = OrderedDict()  # window index -> TrackStore
+        self._pending = {}  # window index -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getattr__(self, name):
+        # names, teams(), bounds(), tick_range() ... come from the full store
+        return getattr(self.store, name)
+
+    def window_index(self, tick):
+        return int((tick - self.origin) // self.window_ticks)
+
+    def _cut(self, index):
+        # samples with ticks inside the window plus one on either side of it
+        # per entity, so "latest sample" lookups, spawns and interpolation
+        # give the same answers as the full store
+        start = self.origin + index * self.window_ticks
+        end = start + self.window_ticks
+        store = self.store
+        lo, hi = store.sample_rows(start, end)
+        window_offsets = np.zeros(len(lo) + 1, dtype=np.int64)
+        np.cumsum(hi - lo, out=window_offsets[1:])
+        data = np.asarray(store.data[ranges(lo, hi)])
+        return TrackStore(store.names, data, window_offsets, store.deaths)
+
+    def _store(self, index, window):
+        with self._lock:
+            self._pending.pop(index, None)
+            self._windows[index] = window
+            self._windows.move_to_end(index)
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+
+    def _load(self, index):
+        window = self._cut(index)
+        self._store(index, window)
+        return window
+
+    def window(self, index):
+        with self._lock:
+            window = self._windows.get(index)
+            if window is not None:
+                self._windows.move_to_end(index)
+                return window
+            future = self._pending.get(index)
+        if future is not None:
+            return future.result()
+        return self._load(index)
+
+    def is_ready(self, index):
+        with self._lock:
+            return index in self._windows
+
+    def prefetch(self, index):
+        # one window in flight at a time, so fast scrubbing does not queue
+        # up cuts of windows that are already behind the slider
+        with self._lock:
+            if index in self._windows or self._pending:
+                return
+            self._pending[index] = self._executor.submit(self._load, index)
+
+    def positions_at(self, tick, interpolate=False):
+        index = self.window_index(tick)
+        window = self.window(index)
+        tick_range = self.store.tick_range()
+        if tick_range and self.origin + (index + 1) * self.window_ticks <= tick_range[1]:
+            self.prefetch(index + 1)
+        return window.positions_at(tick, interpolate=interpolate)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(window.nbytes() for window in self._windows.values())
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
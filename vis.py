@@ -1,18 +1,33 @@
 import json
-import matplotlib
+import os
 
-matplotlib.use("TkAgg")  # Or 'Qt5Agg', 'WXAgg',
+import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import numpy as np
 from matplotlib.widgets import Button, Slider
-from PIL import Image
-
 
-def load_data(filepath):
+import instrument
+from background import BackgroundTask, export_in_background, load_replay
+from blit_manager import BlitManager
+from building_layer import BuildingLayer
+from building_store import BUILDING_DTYPE, BuildingStore
+from creep_layer import CreepLayer
+from map_texture import MAP_EXTENT, MapLayer, load_texture
+from ingest import BuildingIngest, CreepIngest, HeroIngest, consume, ingest_file
+from playback import PlaybackClock
+from replay_cache import open_replay
+from track_index import TrackIndex
+from track_store import TrackBuilder
+from track_window import WindowedTracks
+
+
+@instrument.traced("load_data")
+def load_data(filepath, use_cache=True):
     try:
-        with open(filepath, "r", encoding="utf-8") as file:
-            return json.load(file)
+        if use_cache:
+            replay = open_replay(filepath)
+            return replay.heroes, replay.buildings, replay.creeps
+        return ingest_file(filepath, [HeroIngest(), BuildingIngest(), CreepIngest()])
     except FileNotFoundError:
         print(f"File {filepath} not found!")
         return None
@@ -21,157 +36,83 @@ def load_data(filepath):
         return None
 
 
-def process_hero_data(data):
-    hero_positions = {}
-    last_positions = {}
-    hero_colors = {}
-
-    hero_teams = {}
-    if data and "heroes" in data and "-1" in data["heroes"]:
-        for hero_name, hero_data in data["heroes"]["-1"].items():
-            hero_teams[hero_name] = hero_data.get("teamNum", 0)
-
-    if data and "heroes" in data:
-        for tick, heroes in data["heroes"].items():
-            if tick == "-1":
-                continue
-            tick = float(tick)
-            for hero_name, hero_data in heroes.items():
-                team = hero_teams.get(hero_name, 0)
-                color = "blue" if team == 2 else "red" if team == 3 else "gray"
-                hero_colors[hero_name] = color
-
-                position = hero_data.get("position")
-                if position:
-                    x, y = position.get("x", 0), position.get("y", 0)
-                    last_positions[hero_name] = (x, y)
-                else:
-                    x, y = last_positions.get(hero_name, (8000, 8000))
-
-                hero_positions.setdefault(hero_name, []).append((tick, x, y))
-
-    return hero_positions, hero_colors
-
-
-def process_building_data(data):
-    building_positions = []
-    building_colors = []
-    if data and "buildings" in data:
-        for tick, buildings in data["buildings"].items():
-            for building_id, building_data in buildings.items():
-                position = building_data.get("position")
-                team = building_data.get("teamNum", 0)
-                color = "blue" if team == 2 else "red" if team == 3 else "orange"
-
-                if position:
-                    x, y = position.get("x", 0), position.get("y", 0)
-                    building_positions.append((x, y))
-                    building_colors.append(color)
-    return building_positions, building_colors
-
-
-def process_creep_data(data):
-    creep_positions = {}
-    creep_colors = {}
-    creep_death_times = {}
-
-    if data and "creeps" in data:
-        for tick, creeps in data["creeps"].items():
-            tick = float(tick)
-            for creep_id, creep_data in creeps.items():
-                if creep_data.get("deleted", False):
-                    creep_death_times[creep_id] = tick
-                    continue
-
-                position = creep_data.get("position")
-                if position:
-                    x, y = position.get("x", 0), position.get("y", 0)
-
-                    team = creep_data.get("teamNum", 0)
-                    color = (
-                        "lightblue"
-                        if team == 2
-                        else "magenta"
-                        if team == 3
-                        else "orange"
-                    )
-                    creep_colors[creep_id] = color
-
-                    if creep_id not in creep_positions:
-                        creep_positions[creep_id] = []
-                    creep_positions[creep_id].append((tick, x, y))
-
-    return creep_positions, creep_colors, creep_death_times
+HERO_COLORS = {2: "blue", 3: "red"}
+BUILDING_COLORS = {2: "blue", 3: "red"}
+CREEP_COLORS = {2: "lightblue", 3: "magenta"}
+# playback redraws at ~30 fps; SAMPLES_PER_SECOND sets the default speed
+FRAME_INTERVAL_MS = 33
+SAMPLES_PER_SECOND = 5
+INSPECT_PIXELS = 15  # how far from a marker a click still picks it
+INSPECT_LABELS = {"heroes": "Hero", "creeps": "Creep"}
+LOAD_POLL_MS = 100  # how often the viewer picks up background results
 
 
-def setup_plot(
-    hero_positions,
-    building_positions,
-    building_colors,
-    hero_colors,
-    creep_positions,
-    creep_colors,
-    background_image_path="Game_map_7.33.webp",
-):
-    all_coords = (
-        [(x, y) for positions in hero_positions.values() for _, x, y in positions]
-        + building_positions
-        + [
-            (x, y)
-            for positions in creep_positions.values()
-            for _, x, y in positions
-            if x is not None
-        ]
+# process_* take (tick, entity_id, record) events, e.g. from
+# replay_stream.iter_records
+@instrument.traced("process_hero_data")
+def process_hero_data(records):
+    return consume(HeroIngest(), records)
+
+
+@instrument.traced("process_building_data")
+def process_building_data(records):
+    return consume(BuildingIngest(), records)
+
+
+@instrument.traced("process_creep_data")
+def process_creep_data(records):
+    return consume(CreepIngest(), records)
+
+
+def data_limits(bounds):
+    # (x_min, x_max, y_min, y_max) covering every (x_min, x_max, y_min, y_max)
+    bounds = [b for b in bounds if b]
+    if not bounds:
+        return -100, 100, -100, 100
+    bounds = np.array(bounds)
+    return (
+        bounds[:, 0].min(),
+        bounds[:, 1].max(),
+        bounds[:, 2].min(),
+        bounds[:, 3].max(),
     )
 
-    if all_coords:
-        x_min, x_max = (
-            np.min([x for x, _ in all_coords]),
-            np.max([x for x, _ in all_coords]),
-        )
-        y_min, y_max = (
-            np.min([y for _, y in all_coords]),
-            np.max([y for _, y in all_coords]),
-        )
-    else:
-        x_min, x_max, y_min, y_max = -100, 100, -100, 100
 
-    fig, ax = plt.subplots(figsize=(9, 9))
-    plt.subplots_adjust(bottom=0.15)
-    if background_image_path:
-        img = Image.open(background_image_path)
-        ax.imshow(
-            img,
-            extent=[x_min - 1500, x_max + 1500, y_min - 1000, y_max + 1600],
-            aspect="auto",
-        )
+def set_limits(ax, limits):
+    x_min, x_max, y_min, y_max = limits
     ax.set_xlim(x_min - 100, x_max + 100)
     ax.set_ylim(y_min - 100, y_max + 100)
-    ax.set_xlabel("X Position")
-    ax.set_ylabel("Y Position")
-    ax.grid(True)
 
-    lines = {
-        hero: ax.plot([], [], "o", markersize=10, color=hero_colors[hero], label=hero)[
-            0
-        ]
-        for hero in hero_positions
+
+def hero_lines(ax, hero_names, hero_teams):
+    return {
+        hero: ax.plot(
+            [], [], "o", markersize=10, color=HERO_COLORS.get(team, "gray"), label=hero
+        )[0]
+        for hero, team in zip(hero_names, hero_teams)
     }
 
-    if building_positions:
-        building_scatter = ax.scatter(
-            *zip(*building_positions),
-            marker="^",
-            s=140,
-            c=building_colors,
-            label="Buildings",
-        )
-    else:
-        building_scatter = ax.scatter(
-            [], [], marker="^", s=100, color="gray", label="Buildings"
-        )
 
-    creep_scatter = ax.scatter([], [], marker="s", s=40, color="gray", label="Creeps")
+def setup_axes(
+    ax,
+    hero_names,
+    hero_teams,
+    buildings,
+    limits,
+    background_image_path="Game_map_7.33.webp",
+):
+    # map, hero markers, buildings, creeps and tick label of one match on ax
+    if background_image_path:
+        # drawn at the mipmap level that fits once the limits are set below
+        MapLayer(ax, load_texture(background_image_path))
+    set_limits(ax, limits)
+    ax.set_xlabel("X Position")
+    ax.set_ylabel("Y Position")
+    ax.grid(True)
+
+    lines = hero_lines(ax, hero_names, hero_teams)
+    building_layer = BuildingLayer(ax, buildings, BUILDING_COLORS)
+    creep_layer = CreepLayer(ax, CREEP_COLORS)
 
     tick_text = ax.text(
         0.02,
@@ -183,137 +124,247 @@ def setup_plot(
         bbox=dict(facecolor="white", alpha=0.8, boxstyle="round"),
     )
 
-    return fig, ax, lines, tick_text, building_scatter, creep_scatter
+    return lines, tick_text, building_layer, creep_layer
 
 
-def animate(
-    frame_number,
+def no_buildings():
+    return BuildingStore([], np.empty(0, dtype=BUILDING_DTYPE))
+
+
+@instrument.traced("setup_plot")
+def setup_plot(
+    hero_store,
+    buildings,
+    creep_store,
+    background_image_path="Game_map_7.33.webp",
+):
+    # buildings: BuildingStore, or None for a log without them
+    if buildings is None:
+        buildings = no_buildings()
+    limits = data_limits(
+        [hero_store.bounds(), creep_store.bounds(), buildings.bounds()]
+    )
+
+    fig, ax = plt.subplots(figsize=(9, 9))
+    plt.subplots_adjust(bottom=0.15)
+    lines, tick_text, building_layer, creep_layer = setup_axes(
+        ax,
+        hero_store.names,
+        hero_store.teams(),
+        buildings,
+        limits,
+        background_image_path,
+    )
+    return fig, ax, lines, tick_text, building_layer, creep_layer
+
+
+def draw_positions(
+    tick,
     lines,
-    hero_positions,
+    hero_names,
+    heroes,
     tick_text,
-    creep_scatter,
-    creep_positions,
-    creep_colors,
-    creep_death_times,
+    creep_layer,
+    creeps,
+    building_layer=None,
 ):
-    tick_text.set_text(f"Current Tick: {frame_number}")
-
-    for hero, line in lines.items():
-        if frame_number < len(hero_positions[hero]):
-            x, y = hero_positions[hero][frame_number][1:]
+    # heroes and creeps are TRACK_DTYPE rows as positions_at returns them
+    tick_text.set_text(f"Current Tick: {int(tick)}")
+
+    for line in lines.values():
+        line.set_data([], [])
+    for entity, x, y in zip(
+        heroes["entity"].tolist(), heroes["x"].tolist(), heroes["y"].tolist()
+    ):
+        line = lines.get(hero_names[entity])
+        if line is not None:  # a live log may add heroes after setup
             line.set_data([x], [y])
-        else:
-            line.set_data([], [])
-
-    creep_data = []
-    creep_color_data = []
-    for creep_id, positions in creep_positions.items():
-        if (
-            creep_id in creep_death_times
-            and creep_death_times[creep_id] <= frame_number
-        ):
-            continue
-
-        valid_positions = [
-            (tick, x, y) for tick, x, y in positions if tick <= frame_number
-        ]
 
-        if valid_positions:
-            last_tick, x, y = valid_positions[-1]
-            creep_data.append((x, y))
-            creep_color_data.append(creep_colors[creep_id])
+    creep_layer.update(creeps)
+    instrument.count(len(heroes) + len(creeps))
+
+    artists = tuple(lines.values()) + (tick_text, *creep_layer.artists())
+    if building_layer is not None:
+        building_layer.update(tick)
+        artists = tuple(building_layer.artists()) + artists
+    return artists
+
+
+@instrument.traced("animate")
+def animate(
+    tick,
+    lines,
+    hero_store,
+    tick_text,
+    creep_layer,
+    creep_store,
+    building_layer=None,
+):
+    return draw_positions(
+        tick,
+        lines,
+        hero_store.names,
+        hero_store.positions_at(tick, interpolate=True),
+        tick_text,
+        creep_layer,
+        creep_store.positions_at(tick, interpolate=True),
+        building_layer,
+    )
 
-    if creep_data:
-        creep_scatter.set_offsets(np.array(creep_data))
-        creep_scatter.set_color(creep_color_data)
-    else:
-        creep_scatter.set_offsets(np.empty((0, 2)))
 
-    plt.draw()
-    return tuple(lines.values()) + (tick_text, creep_scatter)
+def build_index(task, store):
+    # BackgroundTask function
+    return TrackIndex(store)
+
+
+def inspect(indexes, x, y, tick, max_distance):
+    # description of the entity nearest to (x, y) at tick, from
+    # (label, TrackIndex) pairs; "" when nothing is within max_distance
+    best = None
+    for label, index in indexes:
+        rows, distances = index.nearest(x, y, tick, max_distance=max_distance)
+        if len(rows) and (best is None or distances[0] < best[0]):
+            best = (distances[0], label, index.store.names[rows["entity"][0]], rows[0])
+    if best is None:
+        return ""
+    _, label, name, row = best
+    return (
+        f"{label} {name} (team {row['team']})\n"
+        f"({row['x']:.0f}, {row['y']:.0f}) at tick {row['tick']}"
+    )
 
 
 def main():
-    data = load_data("dummy_data.json")
-    if not data:
-        return
-
-    hero_positions, hero_colors = process_hero_data(data)
-    building_positions, building_colors = process_building_data(data)
-    creep_positions, creep_colors, creep_death_times = process_creep_data(data)
-
-    fig, ax, lines, tick_text, building_scatter, creep_scatter = setup_plot(
-        hero_positions,
-        building_positions,
-        building_colors,
-        hero_colors,
-        creep_positions,
-        creep_colors,
+    # the interactive viewer needs a GUI backend; export.py renders with Agg
+    matplotlib.use("TkAgg")  # Or 'Qt5Agg', 'WXAgg',
+    log_path = "dummy_data.json"
+
+    # the window opens at once: the log (or its cache) is loaded in the
+    # background and heroes, buildings and creeps join the plot as they arrive
+    loader = BackgroundTask(load_replay, log_path)
+    export_task = None
+    export_enabled = False  # once the loader has written the cache
+
+    fig, ax = plt.subplots(figsize=(9, 9))
+    plt.subplots_adjust(bottom=0.15)
+    lines, tick_text, building_layer, creep_layer = setup_axes(
+        ax,
+        [],
+        [],
+        no_buildings(),
+        data_limits([]),
         background_image_path="Game_map_7.33.webp",
     )
+    ax.set_xlim(MAP_EXTENT[:2])
+    ax.set_ylim(MAP_EXTENT[2:])
+    hero_store = None  # WindowedTracks once the heroes are in
+    creep_store = TrackBuilder().build()
+    next_creeps = None  # WindowedTracks waiting for its first window
+    loaded = {}  # section name -> TrackStore / BuildingStore
+    index_tasks = {}  # "Hero"/"Creep" -> BackgroundTask building its TrackIndex
+
+    inspect_text = ax.text(
+        0.02,
+        0.98,
+        "",
+        transform=ax.transAxes,
+        fontsize=10,
+        va="top",
+        bbox=dict(facecolor="white", alpha=0.8, boxstyle="round"),
+    )
+    fps_text = ax.text(
+        0.98,
+        0.98,
+        "",
+        transform=ax.transAxes,
+        fontsize=9,
+        ha="right",
+        va="top",
+        bbox=dict(facecolor="white", alpha=0.8, boxstyle="round"),
+    )
+    status_text = fig.text(0.02, 0.97, "Loading...", fontsize=10, va="top")
+    # only these artists change between frames; the map and widgets stay in
+    # the cached background. Buildings are redrawn each frame (a few dozen
+    # markers) so destroyed ones vanish without refreshing the background.
+    # Hero markers are inserted after the building layer once they are loaded.
+    blit_manager = BlitManager(
+        fig.canvas,
+        building_layer.artists()
+        + [tick_text, *creep_layer.artists(), fps_text, inspect_text, status_text],
+    )
+
+    clock = PlaybackClock(0, 0, 0)
 
-    frames_count = max(len(p) for p in hero_positions.values())
-    ani = FuncAnimation(
-        fig,
-        lambda frame: animate(
-            frame,
+    def draw_frame(tick):
+        if hero_store is None:
+            return
+        animate(
+            tick,
             lines,
-            hero_positions,
+            hero_store,
             tick_text,
-            creep_scatter,
-            creep_positions,
-            creep_colors,
-            creep_death_times,
-        ),
-        frames=frames_count,
-        interval=200,
-        repeat=True,
-        blit=False,
-    )
+            creep_layer,
+            creep_store,
+            building_layer,
+        )
+        fps_text.set_text(
+            f"{blit_manager.fps():.1f} fps (render {blit_manager.render_fps():.0f} fps)"
+        )
+        blit_manager.update()
+
+    def advance():
+        draw_frame(clock.advance())
+
+    timer = fig.canvas.new_timer(interval=FRAME_INTERVAL_MS)
+    timer.add_callback(advance)
 
     is_playing = True
 
     def toggle_play(_):
         nonlocal is_playing
         if is_playing:
-            ani.event_source.stop()
+            timer.stop()
             btn_playpause.label.set_text("Play")
         else:
-            ani.event_source.start()
+            clock.pause()
+            if hero_store is not None:
+                timer.start()
             btn_playpause.label.set_text("Pause")
         is_playing = not is_playing
         plt.draw()
 
     def reset_animation(_):
-        ani.event_source.stop()
-        slider.set_val(0)
-        animate(
-            0,
-            lines,
-            hero_positions,
-            tick_text,
-            creep_scatter,
-            creep_positions,
-            creep_colors,
-            creep_death_times,
-        )
+        timer.stop()
+        slider.set_val(clock.start)
+        clock.seek(clock.start)
+        draw_frame(clock.start)
         btn_playpause.label.set_text("Play")
         plt.draw()
 
     def slider_update(val):
-        frame = int(val)
-        ani.event_source.stop()
-        animate(
-            frame,
-            lines,
-            hero_positions,
-            tick_text,
-            creep_scatter,
-            creep_positions,
-            creep_colors,
-            creep_death_times,
+        timer.stop()
+        clock.seek(val)
+        draw_frame(clock.tick)
+
+    def speed_update(val):
+        if hero_store is not None:
+            clock.rate = hero_store.sample_interval() * SAMPLES_PER_SECOND * val
+
+    def start_export(_):
+        nonlocal export_task
+        # the export opens the cache the loader writes; until that is done
+        # it would start a second build of the same cache
+        if not export_enabled:
+            return
+        if export_task is not None and not export_task.done():
+            return
+        # one core is left to playback
+        export_task = BackgroundTask(
+            export_in_background,
+            log_path,
+            os.path.splitext(log_path)[0] + ".mp4",
+            workers=max((os.cpu_count() or 2) - 1, 1),
         )
-        plt.draw()
 
     ax_playpause = plt.axes([0.4, 0.02, 0.1, 0.04])
     btn_playpause = Button(ax_playpause, "Pause")
@@ -323,10 +374,126 @@ def main():
     btn_reset = Button(ax_reset, "Reset")
     btn_reset.on_clicked(reset_animation)
 
+    ax_export = plt.axes([0.52, 0.07, 0.1, 0.04])
+    btn_export = Button(ax_export, "Export")
+    btn_export.label.set_color("gray")  # until the replay is loaded
+    btn_export.on_clicked(start_export)
+
+    # the tick range is set once the heroes are loaded
     ax_slider = plt.axes([0.15, 0.02, 0.2, 0.04])
-    slider = Slider(ax_slider, "Frame", 0, frames_count - 1, valinit=0, valstep=1)
+    slider = Slider(ax_slider, "Tick", 0, 1, valinit=0, valstep=1)
     slider.on_changed(slider_update)
 
+    ax_speed = plt.axes([0.72, 0.02, 0.18, 0.04])
+    speed_slider = Slider(ax_speed, "Speed", 0.25, 8, valinit=1)
+    speed_slider.on_changed(speed_update)
+
+    def on_heroes(heroes):
+        nonlocal hero_store, clock
+        # frames only read the tick windows around the playback position
+        hero_store = WindowedTracks(heroes)
+        lines.update(hero_lines(ax, hero_store.names, hero_store.teams()))
+        for index, line in enumerate(lines.values(), len(building_layer.artists())):
+            blit_manager.add_artist(line, index)
+
+        tick_min, tick_max = hero_store.tick_range() or (0, 0)
+        # the default speed replays one log sample per old 200 ms animation step
+        clock = PlaybackClock(
+            tick_min,
+            tick_max,
+            hero_store.sample_interval() * SAMPLES_PER_SECOND * speed_slider.val,
+        )
+        slider.valmin, slider.valmax = tick_min, max(tick_max, tick_min + 1)
+        slider.valinit = tick_min
+        ax_slider.set_xlim(slider.valmin, slider.valmax)
+        slider.eventson = False
+        slider.set_val(tick_min)
+        slider.eventson = True
+        if is_playing:
+            timer.start()
+
+    def on_buildings(buildings):
+        building_layer.set_buildings(buildings)
+
+    def on_creeps(creeps):
+        nonlocal next_creeps
+        # creeps are drawn once the window at the playback position is cut,
+        # which for a whole match of creeps takes a while
+        next_creeps = WindowedTracks(creeps)
+
+    on_section = {"heroes": on_heroes, "buildings": on_buildings, "creeps": on_creeps}
+
+    def task_status(task, label):
+        if task is None:
+            return ""
+        if task.error is not None:
+            return f"{label} failed: {task.error}"
+        if task.done():
+            return task.status if task is export_task else ""
+        return f"{task.status} {task.progress:.0%}"
+
+    def poll():
+        nonlocal creep_store, next_creeps, export_enabled
+        if next_creeps is not None:
+            index = next_creeps.window_index(clock.tick)
+            if next_creeps.is_ready(index):
+                creep_store, next_creeps = next_creeps, None
+            else:
+                next_creeps.prefetch(index)
+
+        ready = loader.ready()
+        for name, value in ready:
+            loaded[name] = value
+            on_section[name](value)
+            if name in INSPECT_LABELS:
+                # click-to-inspect indexes are built off the GUI thread
+                index_tasks[INSPECT_LABELS[name]] = BackgroundTask(build_index, value)
+        if ready:
+            set_limits(ax, data_limits([store.bounds() for store in loaded.values()]))
+            # new artists and limits need a fresh cached background
+            fig.canvas.draw_idle()
+            draw_frame(clock.tick)
+
+        if loader.done() and loader.error is None and not export_enabled:
+            export_enabled = True
+            btn_export.label.set_color("black")
+            fig.canvas.draw_idle()
+
+        status = "\n".join(
+            text
+            for text in (
+                task_status(loader, "Loading"),
+                task_status(export_task, "Export"),
+            )
+            if text
+        )
+        if status != status_text.get_text():
+            status_text.set_text(status)
+            if not (is_playing and hero_store is not None):
+                blit_manager.update()  # otherwise the next frame shows it
+
+    poll_timer = fig.canvas.new_timer(interval=LOAD_POLL_MS)
+    poll_timer.add_callback(poll)
+    poll_timer.start()
+
+    def on_click(event):
+        toolbar = getattr(fig.canvas, "toolbar", None)
+        if event.inaxes is not ax or event.button != 1 or (toolbar and toolbar.mode):
+            return
+        # sections whose index is not built yet cannot be picked from
+        indexes = [
+            (label, task.result)
+            for label, task in index_tasks.items()
+            if task.done() and task.result is not None
+        ]
+        x0, x1 = ax.get_xlim()
+        max_distance = INSPECT_PIXELS * abs(x1 - x0) / ax.bbox.width
+        found = inspect(indexes, event.xdata, event.ydata, clock.tick, max_distance)
+        inspect_text.set_text(found)
+        blit_manager.update()
+
+    fig.canvas.mpl_connect("button_press_event", on_click)
+
     plt.show()
 
 